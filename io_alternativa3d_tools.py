@@ -10,15 +10,26 @@ bl_info = {
 	'tracker_url': 'http://davidejones.com',
 	'category': 'Import-Export'}
 
-import bpy, os, time, zlib, tempfile, re, shutil
+import bpy, bmesh, os, sys, time, zlib, tempfile, re, shutil, hashlib, socket, json
+from io import BytesIO
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
 from binascii import hexlify
+from base64 import b64encode
 from struct import unpack, pack, calcsize
 from math import atan, atan2
 from mathutils import Vector, Matrix, Quaternion
-from bpy_extras.io_utils import path_reference,path_reference_copy
+from bpy_extras.io_utils import path_reference
 from bpy_extras.image_utils import load_image
 from bpy.props import *
 
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
 #==================================
 # Common Functions 
 #==================================
@@ -57,7 +68,41 @@ def cleanupString(input):
 	output = re.sub(reg,"",output)
 	return output
 
-def ConvertQuadsToTris(obj):	
+def weldVertices(verts,faces,norms,uvlayers):
+	#merge vertices sharing the same position/normal/uvs and remap faces onto them
+	#a3d buffers are split per face corner, so this restores shared topology
+	numverts = len(verts)
+	if (len(norms) > 0) and (len(norms) != numverts):
+		return verts,faces,norms,uvlayers
+	for uvindex, uvdata in uvlayers.items():
+		if len(uvdata) != numverts:
+			return verts,faces,norms,uvlayers
+
+	weldindex = {}
+	remap = []
+	wverts,wnorms = [],[]
+	wuvlayers = {}
+	for uvindex in uvlayers.keys():
+		wuvlayers[uvindex] = []
+
+	for i in range(numverts):
+		key = (tuple(verts[i]), tuple(norms[i]) if len(norms) > 0 else None, tuple([tuple(uvdata[i]) for uvdata in uvlayers.values()]))
+		idx = weldindex.get(key)
+		if idx is None:
+			idx = len(wverts)
+			weldindex[key] = idx
+			wverts.append(verts[i])
+			if len(norms) > 0:
+				wnorms.append(norms[i])
+			for uvindex, uvdata in uvlayers.items():
+				wuvlayers[uvindex].append(uvdata[i])
+		remap.append(idx)
+
+	wfaces = [tuple([remap[v] for v in face]) for face in faces]
+	print("welded %i vertices to %i" % (numverts,len(wverts)))
+	return wverts,wfaces,wnorms,wuvlayers
+
+def ConvertQuadsToTris(obj):
 	for object in bpy.data.objects:
 			object.select = False
 	obj.select = True
@@ -80,11 +125,70 @@ def ConvertQuadsToTris(obj):
 	bpy.ops.object.mode_set(mode="EDIT", toggle = False)
 	bpy.ops.object.mode_set(mode="OBJECT", toggle = True)
 
-def copyImages(obj,filepath):
+class ExportMesh:
+	#triangulated copy of a mesh, still reports the source name/users so
+	#class names and linked copy detection are unchanged
+	def __init__(self,source,mesh):
+		self.source = source
+		self.mesh = mesh
+	
+	def __getattr__(self,name):
+		if name in ("name","users"):
+			return getattr(self.source,name)
+		return getattr(self.mesh,name)
+
+class ExportObject:
+	#stands in for an object during export, with data swapped for an ExportMesh
+	def __init__(self,obj,data):
+		self.source = obj
+		self.data = data
+	
+	def __getattr__(self,name):
+		return getattr(self.source,name)
+	
+	def __contains__(self,key):
+		return key in self.source
+	
+	def __getitem__(self,key):
+		return self.source[key]
+
+def getTriangulatedObject(obj):
+	#triangulate a copy of the mesh in memory, the user's mesh, selection and mode are untouched
+	if not (hasattr(bmesh,"ops") and hasattr(bmesh.ops,"triangulate")):
+		#older blender, fall back to the operator
+		ConvertQuadsToTris(obj)
+		return obj
+	mesh = obj.data.copy()
+	bm = bmesh.new()
+	bm.from_mesh(mesh)
+	bmesh.ops.triangulate(bm, faces=bm.faces[:])
+	bm.to_mesh(mesh)
+	bm.free()
+	return ExportObject(obj,ExportMesh(obj.data,mesh))
+
+def getSharedTriangulatedObject(obj,triangulated):
+	#getTriangulatedObject for exports that write every user of a mesh, the first user's copy
+	#is kept in triangulated (mesh name -> object) and shared, free them after the export loop
+	if obj.data.users < 2:
+		return getTriangulatedObject(obj)
+	if obj.data.name not in triangulated:
+		triangulated[obj.data.name] = getTriangulatedObject(obj)
+	tobj = triangulated[obj.data.name]
+	if isinstance(tobj,ExportObject):
+		return ExportObject(obj,tobj.data)
+	return obj
+
+def freeTriangulatedObject(obj):
+	if isinstance(obj,ExportObject):
+		#the copy's address can be reused by the next copy, forget its surfaces
+		dropSurfaces(obj.data.mesh)
+		bpy.data.meshes.remove(obj.data.mesh)
+
+def copyImages(obj,filepath,copy_set,sortfaces=False):
+	#collect the images of obj into copy_set, copyImageSet does the copying once per export
 	mesh = obj.data
 	source_dir = bpy.data.filepath
 	dest_dir = os.path.dirname(filepath)
-	copy_set = set()
 	
 	#print("filepath="+str(filepath))
 	#print("source_dir="+str(source_dir))
@@ -98,24 +202,68 @@ def copyImages(obj,filepath):
 					img = tex.image
 					rel = path_reference(bpy.path.abspath(img.filepath), source_dir, dest_dir, 'COPY', "", copy_set)
 	else:
-		start,end,mts,mats,uvimgs = collectSurfaces(mesh)
+		(start,end,mts,mats,uvimgs),order = getSurfaces(mesh,sortfaces)
 		#os.path.basename(bpy.path.abspath(uvimgs[x].filepath))
 		if len(uvimgs) > 0:
 			for x in range(len(uvimgs)):
 				if uvimgs[x] != None:
 					rel = path_reference(bpy.path.abspath(uvimgs[x].filepath), source_dir, dest_dir, 'COPY', "", copy_set)
-	
-	path_reference_copy(copy_set)
+
+def getFileHash(path):
+	h = hashlib.sha1()
+	with open(path,'rb') as f:
+		for chunk in iter(lambda: f.read(1048576), b''):
+			h.update(chunk)
+	return h.digest()
+
+def isImageCopied(src,dst):
+	#same size and mtime as the last copy, or same content if only the mtime differs
+	if not os.path.exists(dst):
+		return False
+	srcstat = os.stat(src)
+	dststat = os.stat(dst)
+	if srcstat.st_size != dststat.st_size:
+		return False
+	if srcstat.st_mtime == dststat.st_mtime:
+		return True
+	return getFileHash(src) == getFileHash(dst)
+
+def copyImage(paths):
+	src, dst = paths
+	if isImageCopied(src,dst):
+		return False
+	shutil.copy2(src,dst)
+	return True
+
+def copyImageSet(copy_set):
+	#copy every image of the export once, skipping the ones already up to date at the destination
+	todo = []
+	for src, dst in sorted(copy_set):
+		if not os.path.exists(src):
+			print("missing image %s" % src)
+		elif os.path.exists(dst) and os.path.samefile(src,dst):
+			continue
+		else:
+			if not os.path.isdir(os.path.dirname(dst)):
+				os.makedirs(os.path.dirname(dst))
+			todo.append((src,dst))
+	if len(todo) > 0:
+		with ThreadPoolExecutor(max_workers=min(len(todo),cpu_count()*2)) as pool:
+			copied = len([c for c in pool.map(copyImage,todo) if c == True])
+	else:
+		copied = 0
+	print("copied %i images, %i already up to date\n" % (copied,len(todo)-copied))
 #==================================
 # AS EXPORTER
 #==================================
 
 class ASExporterSettings:
-	def __init__(self,A3DVersionSystem=1,CompilerOption=1,ExportMode=1,DocClass=False,CopyImgs=True,ByClass=False,ExportAnim=0,ExportUV=1,ExportNormals=1,ExportTangents=1,ExportUVLayer=2):
+	def __init__(self,A3DVersionSystem=1,CompilerOption=1,ExportMode=1,DocClass=False,DocBatchSize=0,CopyImgs=True,ByClass=False,ExportAnim=0,ExportUV=1,ExportNormals=1,ExportTangents=1,ExportUVLayer=2,DedupVertices=1,SortSurfaces=1,ByteArrayEncoding=1,ByteArrayPrecision=1,EmbedGeometry=False,InterleaveStream=False,SplitClasses=False,ShareLinkedMeshes=True,filePath=""):
 		self.A3DVersionSystem = int(A3DVersionSystem)
 		self.CompilerOption = int(CompilerOption)
 		self.ExportMode = int(ExportMode)
 		self.DocClass = bool(DocClass)
+		self.DocBatchSize = int(DocBatchSize)
 		self.CopyImgs = bool(CopyImgs)
 		self.ByClass = bool(ByClass)
 		self.ExportAnim = int(ExportAnim)
@@ -123,6 +271,23 @@ class ASExporterSettings:
 		self.ExportNormals = int(ExportNormals)
 		self.ExportTangents = int(ExportTangents)
 		self.ExportUVLayer = int(ExportUVLayer)
+		self.DedupVertices = int(DedupVertices)
+		self.SortSurfaces = int(SortSurfaces)
+		self.ByteArrayEncoding = int(ByteArrayEncoding)
+		#base64 decoding needs mx.utils from the flex sdk, the flash ide gets the uint list
+		if (self.ByteArrayEncoding == 2) and (self.CompilerOption != 1):
+			print("Base64 ByteArray encoding needs Flex, using uint literals\n")
+			self.ByteArrayEncoding = 1
+		self.ByteArrayPrecision = int(ByteArrayPrecision)
+		self.EmbedGeometry = bool(EmbedGeometry)
+		#[Embed] with an octet-stream mimeType is a flex compiler feature, the flash ide gets inline geometry
+		if (self.EmbedGeometry == True) and (self.CompilerOption != 1):
+			print("Embedded binary geometry needs Flex, writing geometry inline\n")
+			self.EmbedGeometry = False
+		self.InterleaveStream = bool(InterleaveStream)
+		self.SplitClasses = bool(SplitClasses)
+		self.ShareLinkedMeshes = bool(ShareLinkedMeshes)
+		self.filePath = filePath
 
 class ASExporter(bpy.types.Operator):
 	bl_idname = "ops.asexporter"
@@ -154,9 +319,25 @@ class ASExporter(bpy.types.Operator):
 	ExportMode = EnumProperty(name="Export", description="Select which objects to export", items=ExportModes, default="1")
 
 	DocClass = BoolProperty(name="Create Document Class", description="Create document class that makes use of exported data", default=False)
+	DocBatchSize = IntProperty(name="Objects Built Per Frame (v8+)", description="Document class builds this many objects each frame instead of all at startup, 0 builds them all in the constructor", default=0, min=0)
 	CopyImgs = BoolProperty(name="Copy Images", description="Copy images to destination folder of export", default=True)
 	ByClass = BoolProperty(name="Use ByteArray Data (v8.27+)", description="Exports mesh data to compressed bytearray in as3", default=False)
 	
+	ByteArrayEncodings = []
+	ByteArrayEncodings.append(("1", "uint Literals", ""))
+	ByteArrayEncodings.append(("2", "Base64 String (Flex)", "Needs the Flex compiler, uint literals are used otherwise"))
+	ByteArrayEncoding = EnumProperty(name="ByteArray Encoding", description="How the compressed bytearray is written into the class", items=ByteArrayEncodings, default="1")
+	
+	ByteArrayPrecisions = []
+	ByteArrayPrecisions.append(("1", "32-bit Values", ""))
+	ByteArrayPrecisions.append(("2", "16-bit UVs", "UVs quantised to 16 bits, 16-bit indices when the mesh allows"))
+	ByteArrayPrecisions.append(("3", "16-bit UVs and Positions", "UVs and positions quantised to 16 bits, 16-bit indices when the mesh allows"))
+	ByteArrayPrecision = EnumProperty(name="ByteArray Precision", description="How positions, uvs and indices are stored in the compressed bytearray", items=ByteArrayPrecisions, default="1")
+	EmbedGeometry = BoolProperty(name="Embed Binary Geometry (v8.27+, Flex)", description="Writes mesh data to a .bin file next to the class and embeds it", default=False)
+	InterleaveStream = BoolProperty(name="Interleaved Vertex Stream (v8+)", description="Writes one float list in vertex stream order instead of one list per attribute", default=False)
+	SplitClasses = BoolProperty(name="One File Per Class (v8+)", description="Writes each mesh class to its own .as file and all materials to one shared class named after the export file", default=False)
+	ShareLinkedMeshes = BoolProperty(name="Share Linked Mesh Geometry (v8+)", description="Writes one geometry class per mesh used by several objects and a small class per object that reuses it", default=True)
+	
 	#ExportAnim = BoolProperty(name="Animation", description="Animation", default=False)
 	ExportUV = BoolProperty(name="Include UVs", description="Normals", default=True)
 	ExportNormals = BoolProperty(name="Include Normals", description="Normals", default=True)
@@ -166,6 +347,9 @@ class ASExporter(bpy.types.Operator):
 	ExportUVLayers.append(("1", "Active UV Layer Only", ""))
 	ExportUVLayers.append(("2", "All UV Layers", ""))
 	ExportUVLayer = EnumProperty(name="UV Layers", description="Select which UV Layers to export", items=ExportUVLayers, default="2")
+	
+	DedupVertices = BoolProperty(name="Merge Duplicate Vertices", description="Write each unique vertex once and share it between faces (v8+)", default=True)
+	SortSurfaces = BoolProperty(name="One Surface Per Material", description="Sort triangles by material so each material is drawn as one surface (v8+)", default=True)
 		
 	filepath = bpy.props.StringProperty()
 
@@ -178,7 +362,7 @@ class ASExporter(bpy.types.Operator):
 			time1 = time.clock()
 			print('Output file : %s' %filePath)
 			file = open(filePath, 'w')
-			Config = ASExporterSettings(A3DVersionSystem=self.A3DVersionSystem,CompilerOption=self.CompilerOption,ExportMode=self.ExportMode, DocClass=self.DocClass,CopyImgs=self.CopyImgs,ByClass=self.ByClass,ExportAnim=False,ExportUV=self.ExportUV,ExportNormals=self.ExportNormals,ExportTangents=self.ExportTangents,ExportUVLayer=self.ExportUVLayer)
+			Config = ASExporterSettings(A3DVersionSystem=self.A3DVersionSystem,CompilerOption=self.CompilerOption,ExportMode=self.ExportMode, DocClass=self.DocClass,DocBatchSize=self.DocBatchSize,CopyImgs=self.CopyImgs,ByClass=self.ByClass,ExportAnim=False,ExportUV=self.ExportUV,ExportNormals=self.ExportNormals,ExportTangents=self.ExportTangents,ExportUVLayer=self.ExportUVLayer,DedupVertices=self.DedupVertices,SortSurfaces=self.SortSurfaces,ByteArrayEncoding=self.ByteArrayEncoding,ByteArrayPrecision=self.ByteArrayPrecision,EmbedGeometry=self.EmbedGeometry,InterleaveStream=self.InterleaveStream,SplitClasses=self.SplitClasses,ShareLinkedMeshes=self.ShareLinkedMeshes,filePath=fp)
 			ASExport(file,Config,fp)
 			
 			file.close()
@@ -193,6 +377,7 @@ class ASExporter(bpy.types.Operator):
 		
 def ASExport(file,Config,fp):
 	print('Export to Alternativa3d Class started...\n')
+	surfaceCache.clear()
 	
 	WritePackageHeader(file,Config)
 		
@@ -205,40 +390,147 @@ def ASExport(file,Config,fp):
 		objs = [obj for obj in bpy.data.objects if obj.type == 'MESH']
 		print('Export all meshes...\n')
 	
+	linked = set()
+	if (Config.ShareLinkedMeshes == True) and (Config.A3DVersionSystem >= 7):
+		linked = getLinkedMeshes(objs)
+	
+	if Config.SplitClasses == True:
+		if Config.A3DVersionSystem >= 7:
+			ASExportClasses(file,Config,fp,objs,linked)
+			return
+		print("One file per class needs v8+, writing a single file\n")
+	
 	aobjs = []
+	copy_set = set()
+	written = set()
+	triangulated = {}
+	#share the sorted surfaces WriteClass8270 already collected
+	sortfaces = (Config.SortSurfaces == 1) and (Config.A3DVersionSystem >= 7)
 	for obj in objs:
-	
-		ConvertQuadsToTris(obj)
 
 		if "a3dtype" in obj:
 			aobjs.append(obj)
-		else:
-			if (Config.A3DVersionSystem == 7) or (Config.A3DVersionSystem == 8) or (Config.A3DVersionSystem == 9) or (Config.A3DVersionSystem == 10) or (Config.A3DVersionSystem == 11):
+		elif obj.data.name in written:
+			#geometry class already written for this linked mesh
+			WriteInstanceClass8270(file,obj,Config)
+			continue
+		else:
+			tobj = getSharedTriangulatedObject(obj,triangulated)
+			if obj.data.name in linked:
+				WriteClass8270(file,tobj,Config,shared=True)
+				WriteInstanceClass8270(file,obj,Config)
+				written.add(obj.data.name)
+			elif (Config.A3DVersionSystem == 7) or (Config.A3DVersionSystem == 8) or (Config.A3DVersionSystem == 9) or (Config.A3DVersionSystem == 10) or (Config.A3DVersionSystem == 11):
 				# version 8.5.0, 8.8.0, 8.12.0, 8.17.0, 8.27.0
-				WriteClass8270(file,obj,Config)
+				WriteClass8270(file,tobj,Config)
 			elif (Config.A3DVersionSystem == 4) or (Config.A3DVersionSystem == 5) or (Config.A3DVersionSystem == 6):
 				# version 7.6.0, 7.7.0, 7.8.0
-				WriteClass78(file,obj,Config)
+				WriteClass78(file,tobj,Config)
 			elif (Config.A3DVersionSystem == 2) or (Config.A3DVersionSystem == 3):
 				# version 7.5.0, 7.5.1
-				WriteClass75(file,obj,Config)
+				WriteClass75(file,tobj,Config)
 			elif Config.A3DVersionSystem == 1:
 				# version 5.6.0
-				WriteClass5(file,obj,Config)
+				WriteClass5(file,tobj,Config)
 			else:
 				print("No Alternativa Version\n")
+			if Config.CopyImgs:
+				copyImages(tobj,fp,copy_set,sortfaces)
+			if obj.data.name not in triangulated:
+				freeTriangulatedObject(tobj)
+			continue
 		
 		if Config.CopyImgs:
-			print("copy images...\n")
-			copyImages(obj,fp)
+			copyImages(obj,fp,copy_set)
+	for tobj in triangulated.values():
+		freeTriangulatedObject(tobj)
+	
+	if Config.CopyImgs:
+		print("copy images...\n")
+		copyImageSet(copy_set)
 
 	WritePackageEnd(file)
 	
 	if Config.DocClass:
-		WriteDocuClass(file,objs,aobjs,Config,fp)
+		WriteDocuClass(file,objs,aobjs,Config,fp,linked)
 	
+	surfaceCache.clear()
 	print('Export Completed...\n')
 	
+def ASExportClasses(file,Config,fp,objs,linked):
+	#the export file becomes a shared class holding every material once, each mesh class
+	#goes to its own <mesh>.as next to it, file and class named by cleanupString like the document class
+	outdir = os.path.dirname(fp)
+	assets = cleanupString(os.path.splitext(os.path.basename(fp))[0])
+	file.write("\tpublic class "+assets+" {\n\n")
+	surfaceCache.clear()
+	
+	aobjs = []
+	copy_set = set()
+	written = set()
+	classes = set()
+	sortfaces = (Config.SortSurfaces == 1)
+	for obj in objs:
+		if "a3dtype" in obj:
+			aobjs.append(obj)
+			if Config.CopyImgs:
+				copyImages(obj,fp,copy_set)
+			continue
+		if obj.data.name in linked:
+			writeInstanceClassFile(Config,os.path.join(outdir,getClassName(obj,linked)+".as"),obj)
+		if obj.data.name in classes:
+			if obj.data.name not in linked:
+				print("%s: class already written for this mesh, skipping %s" % (obj.data.name,obj.name))
+			continue
+		tobj = getTriangulatedObject(obj)
+		for mat in getSurfaces(tobj.data,sortfaces)[0][3]:
+			mt = cleanupString(str(mat.name))
+			if mt not in written:
+				WriteMaterial(file,mt,Config,mat,shared=True)
+				written.add(mt)
+		if obj.data.name in linked:
+			name = getGeometryClassName(obj)
+		else:
+			name = getClassName(obj)
+		writeClassFile(Config,os.path.join(outdir,name+".as"),getClassData8270(Config,tobj,assets+".",name),obj.data.name in linked)
+		classes.add(obj.data.name)
+		if Config.CopyImgs:
+			copyImages(tobj,fp,copy_set,sortfaces)
+		freeTriangulatedObject(tobj)
+	
+	file.write("\t}\n")
+	WritePackageEnd(file)
+	
+	print("wrote %i classes...\n" % len(classes))
+	
+	if Config.CopyImgs:
+		print("copy images...\n")
+		copyImageSet(copy_set)
+	
+	if Config.DocClass:
+		WriteDocuClass(file,objs,aobjs,Config,fp,linked)
+	
+	surfaceCache.clear()
+	print('Export Completed...\n')
+
+def writeClassFile(Config,path,data,shared=False):
+	#one mesh class in its own .as, only touches data collected by getClassData8270
+	file = open(path,'w')
+	WritePackageHeader(file,Config)
+	file.write("\tpublic class "+data[0]+" extends Mesh {\n\n")
+	if shared == True:
+		writeSharedAccessor(file,data[0])
+	writeClassBody8270(file,data,Config)
+	WritePackageEnd(file)
+	file.close()
+
+def writeInstanceClassFile(Config,path,obj):
+	file = open(path,'w')
+	WritePackageHeader(file,Config)
+	WriteInstanceClass8270(file,obj,Config)
+	WritePackageEnd(file)
+	file.close()
+	
 def WritePackageHeader(file,Config):
 	file.write("//Alternativa3D Class Export For Blender 2.62 and above\n")
 	file.write("//Plugin Author: David E Jones, http://davidejones.com\n\n")
@@ -280,12 +572,20 @@ def WritePackageHeader(file,Config):
 		file.write("\timport alternativa.engine3d.materials.TextureMaterial;\n")
 		file.write("\timport alternativa.engine3d.resources.BitmapTextureResource;\n")
 		file.write("\timport alternativa.engine3d.objects.Mesh;\n")
+		if Config.ShareLinkedMeshes == True:
+			file.write("\timport alternativa.engine3d.objects.Surface;\n")
 		file.write("\timport alternativa.engine3d.resources.Geometry;\n")
 		file.write("\timport __AS3__.vec.Vector;\n")
 		file.write("\timport flash.display.Bitmap;\n")
-		if Config.ByClass == 1:
+		if (Config.ByClass == 1) or (Config.EmbedGeometry == True) or (Config.InterleaveStream == True):
 			file.write("\timport flash.utils.ByteArray;\n")
 			file.write("\timport flash.utils.Endian;\n")
+			if (Config.ByteArrayEncoding == 2) and (Config.EmbedGeometry == False):
+				file.write("\timport mx.utils.Base64Decoder;\n")
+		if (Config.EmbedGeometry == True) or (Config.InterleaveStream == True):
+			#vertex stream data is internal to the engine
+			file.write("\timport alternativa.engine3d.alternativa3d;\n")
+			file.write("\tuse namespace alternativa3d;\n")
 		file.write("\n")
 	else:
 		print("version not found")
@@ -368,7 +668,10 @@ def setupMaterials(file,obj,Config):
 			x += 1
 	return mati
 			
-def WriteMaterial(file,id,Config,Material=None):
+def WriteMaterial(file,id,Config,Material=None,shared=False):
+	#shared materials live in one class as statics the mesh classes refer to
+	const = "public static const " if shared else "private static const "
+	var = "public static var " if shared else "private var "
 	if Material:
 		nme = cleanupString(str(Material.name))
 		
@@ -378,32 +681,32 @@ def WriteMaterial(file,id,Config,Material=None):
 			if Config.A3DVersionSystem == 1:
 				#if flex
 				if Config.CompilerOption == 1:
-					file.write('\t\t[Embed(source="'+str(Texture)+'")] private static const bmp'+str(nme)+':Class;\n')
-					file.write('\t\tprivate static const '+str(id)+':TextureMaterial = new TextureMaterial(new Texture(new bmp'+str(nme)+'().bitmapData, "'+str(nme)+'"));\n\n')
+					file.write('\t\t[Embed(source="'+str(Texture)+'")] '+const+'bmp'+str(nme)+':Class;\n')
+					file.write('\t\t'+const+str(id)+':TextureMaterial = new TextureMaterial(new Texture(new bmp'+str(nme)+'().bitmapData, "'+str(nme)+'"));\n\n')
 				else:
 					file.write("\t\t//"+str(Texture)+"\n")
-					file.write("\t\tprivate var bmp"+str(nme)+":Bitmap = new Bitmap(new bd"+str(nme)+"(0,0));\n")
-					file.write('\t\tprivate var '+str(id)+':TextureMaterial = new TextureMaterial(new Texture(new bmp'+str(nme)+'().bitmapData, "'+str(nme)+'"));\n\n')
+					file.write("\t\t"+var+"bmp"+str(nme)+":Bitmap = new Bitmap(new bd"+str(nme)+"(0,0));\n")
+					file.write('\t\t'+var+str(id)+':TextureMaterial = new TextureMaterial(new Texture(new bmp'+str(nme)+'().bitmapData, "'+str(nme)+'"));\n\n')
 			#if version 7.5.0, 7.5.1, 7.6.0, 7.7.0, 7.8.0
 			elif (Config.A3DVersionSystem == 2) or (Config.A3DVersionSystem == 3) or (Config.A3DVersionSystem == 4) or (Config.A3DVersionSystem == 5) or (Config.A3DVersionSystem == 6):
 				#if flex
 				if Config.CompilerOption == 1:
-					file.write('\t\t[Embed(source="'+str(Texture)+'")] private static const bmp'+str(nme)+':Class;\n')
-					file.write('\t\tprivate static const '+str(id)+':TextureMaterial = new TextureMaterial(new bmp'+str(nme)+'().bitmapData, true, true);\n\n')
+					file.write('\t\t[Embed(source="'+str(Texture)+'")] '+const+'bmp'+str(nme)+':Class;\n')
+					file.write('\t\t'+const+str(id)+':TextureMaterial = new TextureMaterial(new bmp'+str(nme)+'().bitmapData, true, true);\n\n')
 				else:
 					file.write("\t\t//"+str(Texture)+"\n")
-					file.write("\t\tprivate var bmp"+str(nme)+":Bitmap = new Bitmap(new bd"+str(nme)+"(0,0));\n")
-					file.write("\t\tprivate var "+str(id)+":TextureMaterial = new TextureMaterial(bmp"+str(nme)+".bitmapData, true, true);\n\n")
+					file.write("\t\t"+var+"bmp"+str(nme)+":Bitmap = new Bitmap(new bd"+str(nme)+"(0,0));\n")
+					file.write("\t\t"+var+str(id)+":TextureMaterial = new TextureMaterial(bmp"+str(nme)+".bitmapData, true, true);\n\n")
 			#if version 8.5.0, 8.8.0, 8.12.0, 8.17.0, 8.27.0
 			elif (Config.A3DVersionSystem == 7) or (Config.A3DVersionSystem == 8) or (Config.A3DVersionSystem == 9) or (Config.A3DVersionSystem == 10) or (Config.A3DVersionSystem == 11):
 				#if flex
 				if Config.CompilerOption == 1:
-					file.write('\t\t[Embed(source="'+str(Texture)+'")] private static const bmp'+str(nme)+':Class;\n')
-					file.write('\t\tprivate static const '+str(id)+':TextureMaterial = new TextureMaterial(new BitmapTextureResource(new bmp'+str(nme)+'().bitmapData));\n\n')
+					file.write('\t\t[Embed(source="'+str(Texture)+'")] '+const+'bmp'+str(nme)+':Class;\n')
+					file.write('\t\t'+const+str(id)+':TextureMaterial = new TextureMaterial(new BitmapTextureResource(new bmp'+str(nme)+'().bitmapData));\n\n')
 				else:
 					file.write("\t\t//"+str(Texture)+"\n")
-					file.write("\t\tprivate var bmp"+str(nme)+":Bitmap = new Bitmap(new bd"+str(nme)+"(0,0));\n")
-					file.write("\t\tprivate var "+str(id)+":TextureMaterial = new TextureMaterial(new BitmapTextureResource(bmp"+str(nme)+".bitmapData));\n\n")
+					file.write("\t\t"+var+"bmp"+str(nme)+":Bitmap = new Bitmap(new bd"+str(nme)+"(0,0));\n")
+					file.write("\t\t"+var+str(id)+":TextureMaterial = new TextureMaterial(new BitmapTextureResource(bmp"+str(nme)+".bitmapData));\n\n")
 			else:
 				print("version not found")
 		else:
@@ -413,7 +716,7 @@ def WriteMaterial(file,id,Config,Material=None):
 			Specularity = Material.specular_intensity
 			Specular = list(Material.specular_color)
 
-			file.write('\t\tprivate var '+id+':FillMaterial = new FillMaterial('+rgb2hex((Diffuse[0], Diffuse[1], Diffuse[2]))+');\n\n')
+			file.write('\t\t'+var+id+':FillMaterial = new FillMaterial('+rgb2hex((Diffuse[0], Diffuse[1], Diffuse[2]))+');\n\n')
 
 
 def GetMaterialTexture(Material):
@@ -429,55 +732,148 @@ def GetMaterialTexture(Material):
 	return img_files[0] if len(img_files) > 0 else None
 
 
-def writeByteArrayValues(file,verts,uvlayers,indices):
-	file.write("\t\t\tvalues= new <uint>[")
-
-	tfile = tempfile.TemporaryFile(mode ='w+b')
+def getByteArrayPrecision(Config,verts):
+	#quantised positions, quantised uvs, 16-bit indices
+	quantpos = Config.ByteArrayPrecision == 3
+	quantuv = Config.ByteArrayPrecision >= 2
+	shortindices = (Config.ByteArrayPrecision >= 2) and (len(verts) <= 65536)
+	return quantpos,quantuv,shortindices
+
+def quantiseValues(rows,comps):
+	#each component mapped from its own min..max range onto 0..65535,
+	#read back as min + value*scale
+	mins,scales = [],[]
+	for c in range(comps):
+		col = [r[c] for r in rows]
+		lo = min(col) if len(col) > 0 else 0.0
+		hi = max(col) if len(col) > 0 else 0.0
+		mins.append(lo)
+		scales.append((hi - lo) / 65535.0)
+	values = []
+	for r in rows:
+		for c in range(comps):
+			values.append(int(round((r[c] - mins[c]) / scales[c])) if scales[c] > 0 else 0)
+	return pack("<%if" % (comps*2), *(mins+scales)) + pack("<%iH" % len(values), *values)
+
+def packByteArrayValues(verts,uvlayers,indices,quantpos=False,quantuv=False,shortindices=False):
+	#compressed geometry read back by the ByteArray class constructor
+	data = []
 	#length of verts -short
-	tfile.write(pack("<H", len(verts)*3))
-	for v in verts:
-		tfile.write(pack("<f", v[0]))
-		tfile.write(pack("<f", v[1]))
-		tfile.write(pack("<f", v[2]))
+	data.append(pack("<H", len(verts)*3))
+	if quantpos == True:
+		data.append(quantiseValues(verts,3))
+	else:
+		data.append(pack("<%if" % (len(verts)*3), *[c for v in verts for c in (v[0],v[1],v[2])]))
 	
 	#length of uvts -short
 	for uvname, uvdata in uvlayers.items():
 		uvt = uvdata[0]
-		tfile.write(pack("<H", len(uvt)*2))
-		for uv in uvt:
-			tfile.write(pack("<f", uv[0]))
-			tfile.write(pack("<f", uv[1]))
+		data.append(pack("<H", len(uvt)*2))
+		if quantuv == True:
+			data.append(quantiseValues(uvt,2))
+		else:
+			data.append(pack("<%if" % (len(uvt)*2), *[c for uv in uvt for c in (uv[0],uv[1])]))
 	
 	#length of indices -short
-	tfile.write(pack("<H", len(indices)))
-	for i in indices:
-		tfile.write(pack("<I", i))
-		
-	tfile.seek(0)
-	
-	indata = tfile.read()
-	outdata = zlib.compress(indata)
-	tfile.close()
-	tfile = tempfile.TemporaryFile(mode ='w+b')
-	tfile.write(outdata)
-	tfile.seek(0)
-	
-	try:
-		byte = tfile.read(1)
-		while byte != "":
-			if len(byte) > 0:
-				#file.write("%X," % int(byte))
-				file.write("0x%X," % unpack('B', byte))
-				byte = tfile.read(1)
-			else:
-				break
-	finally:
-		tfile.close()
+	data.append(pack("<H", len(indices)))
+	data.append(pack("<%i%s" % (len(indices),"H" if shortindices == True else "I"), *indices))
+	return zlib.compress(b"".join(data))
+
+#"0x%X," for every byte value, so the uint literal list is a single join
+byteLiterals = ["0x%X," % b for b in range(256)]
+
+def writeByteArrayValues(file,verts,uvlayers,indices,Config):
+	outdata = packByteArrayValues(verts,uvlayers,indices,*getByteArrayPrecision(Config,verts))
+	if Config.ByteArrayEncoding == 2:
+		#base64 string, a third of the size of the uint list and much quicker to compile
+		file.write("\t\t\tvar decoder:Base64Decoder = new Base64Decoder();\n")
+		file.write("\t\t\tdecoder.decode(\""+b64encode(outdata).decode("ascii")+"\");\n")
+		file.write("\t\t\tbytedata = decoder.toByteArray();\n")
+	else:
+		file.write("\t\t\tvalues= new <uint>[")
+		file.write("".join([byteLiterals[b] for b in outdata]))
+		file.write("];\n")
+		file.write("\t\t\tfor each(var b:uint in values)\n")
+		file.write("\t\t\t{\n")
+		file.write("\t\t\t\tbytedata.writeByte(b);\n")
+		file.write("\t\t\t}\n")
+
+def canBulkExtract(mesh):
+	#bulk path needs triangulated polygons with loops stored in polygon order
+	if not hasattr(mesh,"loops"):
+		return False
+	numpolys = len(mesh.polygons)
+	if len(mesh.loops) != numpolys*3:
+		return False
+	loopstart = array('i',[0]) * numpolys
+	mesh.polygons.foreach_get("loop_start",loopstart)
+	return loopstart == array('i',range(0,numpolys*3,3))
+
+def getCommonDataBulk(Config,obj,flipUV=1):
+	#same output as getCommonData, but the mesh is read with foreach_get into
+	#flat arrays and the per corner stream is built by indexing those
+	mesh = obj.data
+	numverts = len(mesh.vertices)
+	numloops = len(mesh.loops)
+	numpolys = len(mesh.polygons)
+	hasFaceUV = len(mesh.uv_textures) > 0
+	uvlayers = {}
+	uv_coord_list = []
+	tan = []
+	
+	co = array('f',[0.0]) * (numverts*3)
+	mesh.vertices.foreach_get("co",co)
+	vnr = array('f',[0.0]) * (numverts*3)
+	mesh.vertices.foreach_get("normal",vnr)
+	loopverts = array('i',[0]) * numloops
+	mesh.loops.foreach_get("vertex_index",loopverts)
+	
+	if hasFaceUV:
+		#class writers still read tessface uvs after this
+		mesh.update(calc_edges=True, calc_tessface=True)
 		
-	file.write("];\n")
+		pnr = array('f',[0.0]) * (numpolys*3)
+		mesh.polygons.foreach_get("normal",pnr)
+		smooth = [False] * numpolys
+		mesh.polygons.foreach_get("use_smooth",smooth)
+		
+		activeindex = mesh.uv_textures.active_index
+		uvbuf = array('f',[0.0]) * (numloops*2)
+		for uvindex, uvlayer in enumerate(mesh.uv_layers):
+			if (Config.ExportUVLayer == 1) and (uvindex != activeindex):
+				continue
+			uvlayer.data.foreach_get("uv",uvbuf)
+			uv_coord_list = [[uvbuf[i],uvbuf[i+1]] for i in range(0,numloops*2,2)]
+			if flipUV == 1:
+				uvt = [[uv[0],1.0 - uv[1]] for uv in uv_coord_list]
+			else:
+				uvt = [[uv[0],uv[1]] for uv in uv_coord_list]
+			uvlayers[uvlayer.name] = [uvt]
+		
+		vs = [[co[v*3],co[v*3+1],co[v*3+2]] for v in loopverts]
+		nr = []
+		for l in range(numloops):
+			p = int(l/3)
+			if smooth[p]:
+				v = loopverts[l]
+				nr.append([vnr[v*3],vnr[v*3+1],vnr[v*3+2]])
+			else:
+				nr.append([pnr[p*3],pnr[p*3+1],pnr[p*3+2]])
+		ins = list(range(numloops))
+	else:
+		# if there are no image textures, output the old way
+		vs = [[co[i],co[i+1],co[i+2]] for i in range(0,numverts*3,3)]
+		nr = [[vnr[i],vnr[i+1],vnr[i+2]] for i in range(0,numverts*3,3)]
+		ins = list(loopverts)
+	
+	bb = getBoundBox(obj)
+	trns = getObjTransform(obj)
+	return vs,uvlayers,ins,nr,tan,bb,trns
 
 def getCommonData(Config,obj,flipUV=1):
 	mesh = obj.data
+	if canBulkExtract(mesh):
+		return getCommonDataBulk(Config,obj,flipUV)
 	verts = mesh.vertices
 	Materials = mesh.materials
 	hasFaceUV = len(mesh.uv_textures) > 0
@@ -574,9 +970,6 @@ def getCommonData(Config,obj,flipUV=1):
 		for v in mesh.vertices:
 			vs.append([v.co[0],v.co[1],v.co[2]])
 			nr.append([v.normal[0],v.normal[1],v.normal[2]])
-
-	if (len(uvlayers) > 0) and (len(nr) > 0):
-		tan = calculateTangents(ins,vs,uv_coord_list,nr)		
 	
 	bb = getBoundBox(obj)
 	trns = getObjTransform(obj)
@@ -673,10 +1066,6 @@ def getCommonDataNoBmesh(Config,obj,flipUV=1):
 			vs.append([v.co[0],v.co[1],v.co[2]])
 			nr.append([v.normal[0],v.normal[1],v.normal[2]])
 
-	#if we have uv's and normals then calculate tangents
-	if (len(uvlayers) > 0) and (len(nr) > 0):
-		tan = calculateTangents(ins,vs,uv_coord_list,nr)		
-
 	#get bound box
 	bb = getBoundBox(obj)
 
@@ -684,6 +1073,271 @@ def getCommonDataNoBmesh(Config,obj,flipUV=1):
 
 	return vs,uvlayers,ins,nr,tan,bb,trns
 	
+def dedupVertices(vs,uvlayers,ins,nr,tan):
+	#getCommonData emits a vertex per face corner, index every unique
+	#position/normal/uvs/tangent tuple once and remap the index buffer onto it
+	numverts = len(vs)
+	layers = [uvdata[0] for uvname, uvdata in uvlayers.items()]
+	if (len(nr) > 0) and (len(nr) != numverts):
+		return vs,uvlayers,ins,nr,tan
+	if (len(tan) > 0) and (len(tan) != numverts):
+		return vs,uvlayers,ins,nr,tan
+	for uvt in layers:
+		if len(uvt) != numverts:
+			return vs,uvlayers,ins,nr,tan
+
+	vertindex = {}
+	remap = []
+	dvs,dnr,dtan = [],[],[]
+	dlayers = [[] for uvt in layers]
+	for i in range(numverts):
+		key = (tuple(vs[i]), tuple(nr[i]) if len(nr) > 0 else None, tuple([tuple(uvt[i]) for uvt in layers]), tuple(tan[i]) if len(tan) > 0 else None)
+		idx = vertindex.get(key)
+		if idx is None:
+			idx = len(dvs)
+			vertindex[key] = idx
+			dvs.append(vs[i])
+			if len(nr) > 0:
+				dnr.append(nr[i])
+			if len(tan) > 0:
+				dtan.append(tan[i])
+			for j in range(len(layers)):
+				dlayers[j].append(layers[j][i])
+		remap.append(idx)
+
+	dins = [remap[i] for i in ins]
+	duvlayers = {}
+	j=0
+	for uvname in uvlayers.keys():
+		duvlayers[uvname] = [dlayers[j]]
+		j=j+1
+	return dvs,duvlayers,dins,dnr,dtan
+
+def hasTangents(Config,uvlayers,nr):
+	return (Config.ExportTangents == 1) and (len(uvlayers) > 0) and (len(nr) > 0)
+
+def getTangents(Config,vs,uvlayers,ins,nr):
+	#the getCommonData functions leave tan empty, tangents are computed by the writers on the
+	#index buffer they write, after welding, so every triangle sharing a vertex adds to it
+	if hasTangents(Config,uvlayers,nr):
+		return calculateTangents(ins,vs,getTangentUVs(uvlayers),nr)
+	return []
+
+def calculateACMR(ins,cachesize=32):
+	#average cache miss ratio, misses per triangle with a fifo post-transform cache
+	numtris = int(len(ins)/3)
+	if numtris == 0:
+		return 0.0
+	cache = []
+	cached = set()
+	misses = 0
+	for i in ins:
+		if i not in cached:
+			misses = misses + 1
+			cache.append(i)
+			cached.add(i)
+			if len(cache) > cachesize:
+				cached.discard(cache.pop(0))
+	return float(misses)/numtris
+
+def optimizeVertexCache(ins,numverts,cachesize=32):
+	#reorder a triangle list with Tom Forsyth's linear-speed vertex cache optimisation
+	#http://tomforsyth1000.github.io/papers/fast_vert_cache_opt.html
+	numtris = int(len(ins)/3)
+	if numtris == 0:
+		return list(ins)
+
+	vtris = [[] for v in range(numverts)]
+	for t in range(numtris):
+		vtris[ins[t*3]].append(t)
+		vtris[ins[t*3+1]].append(t)
+		vtris[ins[t*3+2]].append(t)
+	remaining = [len(tris) for tris in vtris]
+	cachepos = [-1] * numverts
+
+	def vertexScore(v):
+		if remaining[v] == 0:
+			return -1.0
+		score = 0.0
+		pos = cachepos[v]
+		if pos >= 0:
+			if pos < 3:
+				#last triangle verts, fixed score so we don't just repeat them
+				score = 0.75
+			else:
+				score = (1.0 - float(pos - 3) / (cachesize - 3)) ** 1.5
+		#favour verts with few triangles left, to finish them off
+		score = score + 2.0 * (remaining[v] ** -0.5)
+		return score
+
+	vscore = [vertexScore(v) for v in range(numverts)]
+	tscore = [vscore[ins[t*3]] + vscore[ins[t*3+1]] + vscore[ins[t*3+2]] for t in range(numtris)]
+	emitted = [False] * numtris
+	cache = []
+	out = []
+	best = -1
+	cursor = 0
+
+	for n in range(numtris):
+		if best < 0:
+			#nothing in cache to continue from, take next unused triangle
+			while emitted[cursor]:
+				cursor = cursor + 1
+			best = cursor
+
+		tri = (ins[best*3],ins[best*3+1],ins[best*3+2])
+		emitted[best] = True
+		out.extend(tri)
+		for v in tri:
+			remaining[v] = remaining[v] - 1
+			vtris[v].remove(best)
+
+		#move triangle verts to the front of the lru cache
+		newcache = list(tri) + [v for v in cache if v not in tri]
+		for v in newcache[cachesize:]:
+			cachepos[v] = -1
+			vscore[v] = vertexScore(v)
+		cache = newcache[:cachesize]
+
+		#rescore cached verts and their triangles, best one is the next to emit
+		touched = set()
+		for pos in range(len(cache)):
+			v = cache[pos]
+			cachepos[v] = pos
+			vscore[v] = vertexScore(v)
+			touched.update(vtris[v])
+		best = -1
+		bestscore = -1.0
+		for t in touched:
+			tscore[t] = vscore[ins[t*3]] + vscore[ins[t*3+1]] + vscore[ins[t*3+2]]
+			if tscore[t] > bestscore:
+				bestscore = tscore[t]
+				best = t
+	return out
+
+def optimizeMeshCache(vs,uvlayers,ins,nr,tan,start,end):
+	#reorder triangles per surface range for the vertex cache, then the
+	#vertex buffer by first use so vertex fetches run through memory in order
+	numverts = len(vs)
+	ranges = []
+	for x in range(len(start)):
+		ranges.append((int(start[x]), int(start[x]) + int(end[x])*3))
+	if len(ranges) == 0:
+		ranges.append((0,len(ins)))
+
+	before = calculateACMR(ins)
+	oins = list(ins)
+	for b,e in ranges:
+		oins[b:e] = optimizeVertexCache(ins[b:e],numverts)
+
+	remap = [-1] * numverts
+	order = []
+	for i in oins:
+		if remap[i] < 0:
+			remap[i] = len(order)
+			order.append(i)
+	#keep unreferenced verts at the end
+	for v in range(numverts):
+		if remap[v] < 0:
+			remap[v] = len(order)
+			order.append(v)
+
+	oins = [remap[i] for i in oins]
+	ovs = [vs[v] for v in order]
+	onr = [nr[v] for v in order] if len(nr) == numverts else nr
+	otan = [tan[v] for v in order] if len(tan) == numverts else tan
+	ouvlayers = {}
+	for uvname, uvdata in uvlayers.items():
+		if len(uvdata[0]) == numverts:
+			ouvlayers[uvname] = [[uvdata[0][v] for v in order]]
+		else:
+			ouvlayers[uvname] = uvdata
+
+	print("vertex cache ACMR %.3f -> %.3f" % (before,calculateACMR(oins)))
+	return ovs,ouvlayers,oins,onr,otan
+
+class GeometryCache:
+	#lru cache of extracted mesh geometry, lives for the blender session so
+	#repeated exports only re-extract meshes that changed
+	def __init__(self,maxsize=500000):
+		self.entries = OrderedDict()
+		self.size = 0
+		self.maxsize = maxsize
+	
+	def reset(self):
+		self.entries = OrderedDict()
+		self.size = 0
+	
+	def get(self,key):
+		if key not in self.entries:
+			return None
+		self.entries.move_to_end(key)
+		return self.entries[key][0]
+	
+	def put(self,key,data,size):
+		if key in self.entries:
+			self.size = self.size - self.entries.pop(key)[1]
+		if size > self.maxsize:
+			return
+		self.entries[key] = (data,size)
+		self.size = self.size + size
+		#evict least recently used until we are back under the cap
+		while self.size > self.maxsize:
+			oldkey, olddata = self.entries.popitem(last=False)
+			self.size = self.size - olddata[1]
+
+geometryCache = GeometryCache()
+
+def getGeometryKey(Config,mesh,flipUV=1):
+	#mesh name plus a hash of everything getCommonData reads, None if it can't be hashed
+	if not hasattr(mesh,"loops"):
+		return None
+	numverts = len(mesh.vertices)
+	numloops = len(mesh.loops)
+	numpolys = len(mesh.polygons)
+	h = hashlib.sha1()
+	
+	buf = array('f',[0.0]) * (numverts*3)
+	mesh.vertices.foreach_get("co",buf)
+	h.update(buf.tobytes())
+	mesh.vertices.foreach_get("normal",buf)
+	h.update(buf.tobytes())
+	buf = array('i',[0]) * numloops
+	mesh.loops.foreach_get("vertex_index",buf)
+	h.update(buf.tobytes())
+	buf = array('i',[0]) * numpolys
+	mesh.polygons.foreach_get("loop_start",buf)
+	h.update(buf.tobytes())
+	mesh.polygons.foreach_get("material_index",buf)
+	h.update(buf.tobytes())
+	smooth = [False] * numpolys
+	mesh.polygons.foreach_get("use_smooth",smooth)
+	h.update(bytes(smooth))
+	buf = array('f',[0.0]) * (numloops*2)
+	for uvlayer in mesh.uv_layers:
+		h.update(uvlayer.name.encode("utf-8"))
+		uvlayer.data.foreach_get("uv",buf)
+		h.update(buf.tobytes())
+	
+	return (mesh.name, h.hexdigest(), len(mesh.uv_textures), mesh.uv_textures.active_index, Config.ExportUVLayer, flipUV)
+
+def getCachedCommonData(Config,obj,flipUV=1,key=None):
+	#getCommonData through geometryCache, callers must not modify the returned lists
+	#bound box and transform belong to the object so they are always read
+	#key is the getGeometryKey of obj.data when the caller already has it
+	if checkBMesh() == False:
+		return getCommonDataNoBmesh(Config,obj,flipUV)
+	if key is None:
+		key = getGeometryKey(Config,obj.data,flipUV)
+	data = geometryCache.get(key) if key is not None else None
+	if data is None:
+		vs,uvlayers,ins,nr,tan,bb,trns = getCommonData(Config,obj,flipUV)
+		if key is not None:
+			geometryCache.put(key,(vs,uvlayers,ins,nr,tan),len(vs))
+		return vs,uvlayers,ins,nr,tan,bb,trns
+	vs,uvlayers,ins,nr,tan = data
+	return vs,uvlayers,ins,nr,tan,getBoundBox(obj),getObjTransform(obj)
+
 def getObjTransform(obj):
 	trns = []
 	c=0
@@ -716,134 +1370,119 @@ def getObjWorldTransform(obj):
 		c=c+1	
 	return trns
 	
+def getTangentUVs(uvlayers):
+	#tangents follow the uvs as they are written (flipped) of the first layer,
+	#which is what the runtime calculateTangents(0) would use
+	return list(uvlayers.values())[0][0]
+
 def calculateTangents(ins,verts,uvs,nrms):
 	# based on alternativas code here
 	# https://github.com/AlternativaPlatform/Alternativa3D/blob/master/src/alternativa/engine3d/resources/Geometry.as
-	tangents = []
-	x=0
-	numIndices = len(ins)
-	
-	#print("numIndices="+str(numIndices))
-	#print("verts="+str(len(verts)))
-	#print("uvs="+str(len(uvs)))
-	#print("normals="+str(len(nrms)))
-	
-	for i in range(numIndices):
-		
-		if i >= numIndices/3:
-			break
-	
-		vertIndexA = ins[x]
-		vertIndexB = ins[x + 1]
-		vertIndexC = ins[x + 2]
-			
-		#vertex1
-		ax = verts[x][0]
-		ay = verts[x][1]
-		az = verts[x][2]
-		#vertex2
-		bx = verts[x + 1][0]
-		by = verts[x + 1][1]
-		bz = verts[x + 1][2]
-		#vertex3
-		cx = verts[x + 2][0]
-		cy = verts[x + 2][1]
-		cz = verts[x + 2][2]
-		#uv
-		au = uvs[x][0]
-		av = uvs[x][1]
-		#uv
-		bu = uvs[x + 1][0]
-		bv = uvs[x + 1][1]
-		#uv
-		cu = uvs[x + 2][0]
-		cv = uvs[x + 2][1]
-		#nrm
-		anx = nrms[x][0]
-		any = nrms[x][1]
-		anz = nrms[x][2]
-		#nrm
-		bnx = nrms[x + 1][0]
-		bny = nrms[x + 1][1]
-		bnz = nrms[x + 1][2]
-		#nrm
-		cnx = nrms[x + 2][0]
-		cny = nrms[x + 2][1]
-		cnz = nrms[x + 2][2]
+	# returns a TANGENT4 (x,y,z,handedness) per vertex
+	if numpy is not None:
+		return calculateTangentsNumpy(ins,verts,uvs,nrms)
+	
+	numverts = len(verts)
+	tangents = [[0.0,0.0,0.0] for v in range(numverts)]
+	bitangents = [[0.0,0.0,0.0] for v in range(numverts)]
+	
+	for x in range(0,len(ins)-2,3):
+		ia = ins[x]
+		ib = ins[x + 1]
+		ic = ins[x + 2]
+		a = verts[ia]
+		b = verts[ib]
+		c = verts[ic]
 		
 		# v2-v1
-		abx = bx - ax
-		aby = by - ay
-		abz = bz - az
-
+		abx = b[0] - a[0]
+		aby = b[1] - a[1]
+		abz = b[2] - a[2]
 		# v3-v1
-		acx = cx - ax
-		acy = cy - ay
-		acz = cz - az
-
-		abu = bu - au
-		abv = bv - av
-
-		acu = cu - au
-		acv = cv - av
-
+		acx = c[0] - a[0]
+		acy = c[1] - a[1]
+		acz = c[2] - a[2]
+		
+		abu = uvs[ib][0] - uvs[ia][0]
+		abv = uvs[ib][1] - uvs[ia][1]
+		acu = uvs[ic][0] - uvs[ia][0]
+		acv = uvs[ic][1] - uvs[ia][1]
+		
 		divisor = (abu*acv - acu*abv)
 		if divisor == 0: divisor = 0.01 #prevent 0 div. error
 		r = 1.0/divisor
-
+		
 		tangentX = r*(acv*abx - acx*abv)
 		tangentY = r*(acv*aby - abv*acy)
 		tangentZ = r*(acv*abz - abv*acz)
-		
-		if vertIndexA in tangents:
-			#exists
-			#print("va exists")
-			tangent = tangents[vertIndexA]
-			tangent.x += tangentX - anx*(anx*tangentX + any*tangentY + anz*tangentZ)
-			tangent.y += tangentY - any*(anx*tangentX + any*tangentY + anz*tangentZ)
-			tangent.z += tangentZ - anz*(anx*tangentX + any*tangentY + anz*tangentZ)
-		else:
-			#doesn't exist
-			#print("va doesn't exist")
-			#tangents[vertIndexA] 
-			tangents.append(Vector((tangentX - anx*(anx*tangentX + any*tangentY + anz*tangentZ),tangentY - any*(anx*tangentX + any*tangentY + anz*tangentZ),tangentZ - anz*(anx*tangentX + any*tangentY + anz*tangentZ))))
-			
-		if vertIndexB in tangents:
-			#exists
-			#print("vb exists")
-			tangent = tangents[vertIndexB]
-			tangent.x += tangentX - bnx*(bnx*tangentX + bny*tangentY + bnz*tangentZ)
-			tangent.y += tangentY - bny*(bnx*tangentX + bny*tangentY + bnz*tangentZ)
-			tangent.z += tangentZ - bnz*(bnx*tangentX + bny*tangentY + bnz*tangentZ)
-		else:
-			#doesn't exist
-			#print("vb doesn't exist")
-			#tangents[vertIndexB] 
-			tangents.append(Vector((tangentX - bnx*(bnx*tangentX + bny*tangentY + bnz*tangentZ),tangentY - bny*(bnx*tangentX + bny*tangentY + bnz*tangentZ),tangentZ - bnz*(bnx*tangentX + bny*tangentY + bnz*tangentZ))))
-			
-		if vertIndexC in tangents:
-			#exists
-			#print("vc exists")
-			tangent = tangents[vertIndexC]
-			tangent.x += tangentX - cnx*(cnx*tangentX + cny*tangentY + cnz*tangentZ)
-			tangent.y += tangentY - cny*(cnx*tangentX + cny*tangentY + cnz*tangentZ)
-			tangent.z += tangentZ - cnz*(cnx*tangentX + cny*tangentY + cnz*tangentZ)
-		else:
-			#doesn't exist
-			#print("vc doesn't exist")
-			#tangents[vertIndexC] 
-			tangents.append(Vector((tangentX - cnx*(cnx*tangentX + cny*tangentY + cnz*tangentZ),tangentY - cny*(cnx*tangentX + cny*tangentY + cnz*tangentZ),tangentZ - cnz*(cnx*tangentX + cny*tangentY + cnz*tangentZ))))
-		
-		
-		#Calculate handedness
-		
-		x = x + 3
-	
-	#normalize
-	for tan in tangents:
-		tan.normalize()
-	
-	return tangents
+		bitangentX = r*(abu*acx - acu*abx)
+		bitangentY = r*(abu*acy - acu*aby)
+		bitangentZ = r*(abu*acz - acu*abz)
+		
+		for i in (ia,ib,ic):
+			#project out the normal, then accumulate on the vertex
+			n = nrms[i]
+			d = n[0]*tangentX + n[1]*tangentY + n[2]*tangentZ
+			tangent = tangents[i]
+			tangent[0] += tangentX - n[0]*d
+			tangent[1] += tangentY - n[1]*d
+			tangent[2] += tangentZ - n[2]*d
+			bitangent = bitangents[i]
+			bitangent[0] += bitangentX
+			bitangent[1] += bitangentY
+			bitangent[2] += bitangentZ
+	
+	result = []
+	for i in range(numverts):
+		t = tangents[i]
+		b = bitangents[i]
+		n = nrms[i]
+		l = (t[0]*t[0] + t[1]*t[1] + t[2]*t[2]) ** 0.5
+		if l > 0:
+			t = [t[0]/l, t[1]/l, t[2]/l]
+		#calculate handedness
+		w = (n[1]*t[2] - n[2]*t[1])*b[0] + (n[2]*t[0] - n[0]*t[2])*b[1] + (n[0]*t[1] - n[1]*t[0])*b[2]
+		result.append((t[0], t[1], t[2], -1.0 if w < 0 else 1.0))
+	return result
+
+def calculateTangentsNumpy(ins,verts,uvs,nrms):
+	#same as calculateTangents but over whole arrays, scatter-adding per triangle results
+	numverts = len(verts)
+	ins = numpy.asarray(ins, dtype=numpy.int64)
+	ins = ins[:len(ins) - len(ins) % 3].reshape(-1,3)
+	vco = numpy.array(verts, dtype=numpy.float64).reshape(-1,3)
+	vuv = numpy.array(uvs, dtype=numpy.float64).reshape(len(uvs),-1)[:,:2]
+	vnr = numpy.array(nrms, dtype=numpy.float64).reshape(-1,3)
+	
+	ia, ib, ic = ins[:,0], ins[:,1], ins[:,2]
+	ab = vco[ib] - vco[ia]
+	ac = vco[ic] - vco[ia]
+	abuv = vuv[ib] - vuv[ia]
+	acuv = vuv[ic] - vuv[ia]
+	
+	divisor = abuv[:,0]*acuv[:,1] - acuv[:,0]*abuv[:,1]
+	divisor[divisor == 0] = 0.01 #prevent 0 div. error
+	r = (1.0/divisor)[:,None]
+	
+	tri_tangent = r*(acuv[:,1,None]*ab - abuv[:,1,None]*ac)
+	tri_bitangent = r*(abuv[:,0,None]*ac - acuv[:,0,None]*ab)
+	
+	#project out the normal of each corner, then accumulate on the vertex
+	corners = ins.T.reshape(-1)
+	n = vnr[corners]
+	t = numpy.tile(tri_tangent, (3,1))
+	t = t - n*numpy.einsum('ij,ij->i', n, t)[:,None]
+	b = numpy.tile(tri_bitangent, (3,1))
+	tangents = numpy.column_stack([numpy.bincount(corners, weights=t[:,k], minlength=numverts) for k in range(3)])
+	bitangents = numpy.column_stack([numpy.bincount(corners, weights=b[:,k], minlength=numverts) for k in range(3)])
+	
+	l = numpy.sqrt(numpy.einsum('ij,ij->i', tangents, tangents))
+	l[l == 0] = 1.0
+	tangents /= l[:,None]
+	#calculate handedness
+	w = numpy.einsum('ij,ij->i', numpy.cross(vnr, tangents), bitangents)
+	w = numpy.where(w < 0, -1.0, 1.0)
+	return numpy.column_stack((tangents, w)).tolist()
 		
 def getBoundBox(obj):
 	#v = [list(bb) for bb in obj.bound_box]
@@ -860,23 +1499,28 @@ def getBoundBox(obj):
 	#return Vec((d[0])), Vec((d[6]))
 	return [d[0][0],d[0][1],d[0][2],d[6][0],d[6][1],d[6][2]]
 
-def writeTransform(file,obj,Config):
-	mesh = obj.data
-	
+def getLocalTransform(obj):
+	#location, euler rotation and scale as plain tuples
 	loc, rot, sca = obj.matrix_local.decompose()
 	rot1 = rot.to_euler()
-	mtrx = obj.matrix_local
+	return tuple(loc),(rot1.x,rot1.y,rot1.z),tuple(sca)
+
+def writeTransform(file,obj,Config):
+	writeTransformValues(file,getLocalTransform(obj))
+
+def writeTransformValues(file,transform):
+	loc, rot1, sca = transform
 	
 	file.write("\n")
-	file.write("\t\t\tthis.x = %f;\n" % loc.x)
-	file.write("\t\t\tthis.y = %f;\n" % loc.y)
-	file.write("\t\t\tthis.z = %f;\n" % loc.z)
-	file.write("\t\t\tthis.rotationX = %f;\n" % rot1.x)
-	file.write("\t\t\tthis.rotationY = %f;\n" % rot1.y)
-	file.write("\t\t\tthis.rotationZ = %f;\n" % rot1.z)
-	file.write("\t\t\tthis.scaleX = %f;\n" % sca.x)
-	file.write("\t\t\tthis.scaleY = %f;\n" % sca.y)
-	file.write("\t\t\tthis.scaleZ = %f;\n" % sca.z)
+	file.write("\t\t\tthis.x = %f;\n" % loc[0])
+	file.write("\t\t\tthis.y = %f;\n" % loc[1])
+	file.write("\t\t\tthis.z = %f;\n" % loc[2])
+	file.write("\t\t\tthis.rotationX = %f;\n" % rot1[0])
+	file.write("\t\t\tthis.rotationY = %f;\n" % rot1[1])
+	file.write("\t\t\tthis.rotationZ = %f;\n" % rot1[2])
+	file.write("\t\t\tthis.scaleX = %f;\n" % sca[0])
+	file.write("\t\t\tthis.scaleY = %f;\n" % sca[1])
+	file.write("\t\t\tthis.scaleZ = %f;\n" % sca[2])
 	
 def writeBoundBox(file,bb,Config):
 	file.write("\n")
@@ -904,28 +1548,212 @@ def writeBoundBox(file,bb,Config):
 	else:
 		print("version not found")
 	
-def WriteClass8270(file,obj,Config):
-	mesh = obj.data
-	verts = mesh.vertices
-	Materials = mesh.materials
-	hasFaceUV = len(mesh.uv_textures) > 0
-	
-	file.write("\tpublic class "+obj.data.name+" extends Mesh {\n\n")
+def WriteClass8270(file,obj,Config,shared=False):
+	name = getGeometryClassName(obj) if shared == True else obj.data.name
+	file.write("\tpublic class "+name+" extends Mesh {\n\n")
+	if shared == True:
+		writeSharedAccessor(file,name)
 	
 	mati = setupMaterials(file,obj,Config)
 	
-	if checkBMesh() == True:
-		vs,uvlayers,ins,nr,tan,bb,trns = getCommonData(Config,obj)
+	writeClassBody8270(file,getClassData8270(Config,obj,"",name),Config)
+
+def getLinkedMeshes(objs):
+	#names of the meshes used by more than one of the exported objects
+	users = {}
+	for obj in objs:
+		if "a3dtype" not in obj:
+			users[obj.data.name] = users.get(obj.data.name,0) + 1
+	return set([name for name, count in users.items() if count > 1])
+
+def getClassName(obj,linked=()):
+	#objects of a linked mesh get an instance class named after the object
+	if obj.data.name in linked:
+		return cleanupString(obj.name)
+	return cleanupString(obj.data.name)
+
+def getGeometryClassName(obj):
+	return cleanupString(obj.data.name)+"Geometry"
+
+def writeSharedAccessor(file,name):
+	#single mesh of a linked geometry class, built the first time an instance asks for it
+	file.write("\t\tprivate static var sharedMesh:"+name+";\n\n")
+	file.write("\t\tpublic static function get shared():"+name+" {\n")
+	file.write("\t\t\tif(sharedMesh == null){sharedMesh = new "+name+"();}\n")
+	file.write("\t\t\treturn sharedMesh;\n")
+	file.write("\t\t}\n\n")
+
+def WriteInstanceClass8270(file,obj,Config):
+	#one object of a linked mesh, reuses the geometry and surfaces of the shared geometry class
+	name = getClassName(obj,[obj.data.name])
+	file.write("\tpublic class "+name+" extends Mesh {\n\n")
+	file.write("\t\tpublic function "+name+"() {\n\n")
+	file.write("\t\t\tvar source:Mesh = "+getGeometryClassName(obj)+".shared;\n")
+	file.write("\t\t\tthis.geometry = source.geometry;\n")
+	file.write("\t\t\tfor(var i:int = 0; i < source.numSurfaces; i++){\n")
+	file.write("\t\t\t\tvar s:Surface = source.getSurface(i);\n")
+	file.write("\t\t\t\tthis.addSurface(s.material, s.indexBegin, s.numTriangles);\n")
+	file.write("\t\t\t}\n")
+	file.write("\t\t\tthis.boundBox = source.boundBox.clone();\n")
+	writeTransformValues(file,getLocalTransform(obj))
+	file.write("\t\t}\n")
+	file.write("\t}\n")
+
+def getClassData8270(Config,obj,matprefix="",name=None):
+	#everything the 8.x class body needs from blender, the body is written from this alone
+	mesh = obj.data
+	if name is None:
+		name = mesh.name
+	vs,uvlayers,ins,nr,tan,bb,trns = getCachedCommonData(Config,obj)
+	#one contiguous surface per material
+	(start,end,mts,mats,uvimgs),order = getSurfaces(mesh,Config.SortSurfaces == 1)
+	mts = [matprefix+mt for mt in mts]
+	return (name,vs,uvlayers,ins,nr,tan,bb,start,end,mts,order,getLocalTransform(obj))
+
+def writeClassBody8270(file,data,Config):
+	name,vs,uvlayers,ins,nr,tan,bb,start,end,mts,order,transform = data
+	if Config.DedupVertices == 1:
+		#weld on position/normal/uvs, the tangents are then accumulated on the welded vertices
+		vs,uvlayers,ins,nr,tan = dedupVertices(vs,uvlayers,ins,nr,[])
+	tan = getTangents(Config,vs,uvlayers,ins,nr)
+	if order is not None:
+		ins = sortTriangles(ins,order)
+		
+	if Config.EmbedGeometry == True:
+		writeEmbeddedGeometry(file,name,Config,vs,uvlayers,ins,nr,tan)
 	else:
-		vs,uvlayers,ins,nr,tan,bb,trns = getCommonDataNoBmesh(Config,obj)
-		
+		writeInlineGeometry(file,name,Config,vs,uvlayers,ins,nr,tan)
+
+	if len(mts) > 0:
+		for x in range(len(mts)):
+			file.write("\t\t\tthis.addSurface("+mts[x]+", "+str(start[x])+", "+str(end[x])+");\n")
+	else:
+		file.write("\t\t\t//this.addSurface(new FillMaterial(0xFF0000), 0, "+str(len(ins))+");\n")
+	
+	file.write("\t\t\tthis.calculateBoundBox();\n")
+	writeTransformValues(file,transform)
+	writeBoundBox(file,bb,Config)
+	file.write("\t\t}\n")
+	file.write("\t}\n")
+
+def getFaceSurfaces(mesh):
+	#single pass over the faces, returns the surface index of every face and the
+	#material (or uv image when there are no materials) of every surface in order of first use
+	Materials = mesh.materials
+	keys,items,ismat = [],[],False
+	seen = {}
+	if len(Materials) > 0:
+		ismat = True
+		if checkBMesh() == True:
+			mefdata = mesh.polygons
+		else:
+			mefdata = mesh.faces
+		matidx = [0] * len(mefdata)
+		mefdata.foreach_get("material_index",matidx)
+		#slots sharing a material share a surface
+		slots = []
+		for srcmat in Materials:
+			if srcmat is None:
+				slots.append(-1)
+				continue
+			if srcmat.name not in seen:
+				seen[srcmat.name] = len(items)
+				items.append(srcmat)
+			slots.append(seen[srcmat.name])
+		last = -1
+		for m in matidx:
+			if m < len(slots) and slots[m] != -1:
+				last = slots[m]
+			keys.append(last)
+	else:
+		#no materials/tex slots
+		#get active uv layer, per face image
+		mesh.update(calc_tessface=True)
+		if len(mesh.tessface_uv_textures) > 0:
+			uvlayer = mesh.tessface_uv_textures.active
+			for face in uvlayer.data:
+				name = face.image.name if face.image != None else None
+				if name not in seen:
+					seen[name] = len(items)
+					items.append(face.image)
+				keys.append(seen[name])
+	
+	if len(items) == 0:
+		return [],items,ismat
+	#faces with no valid material join the first surface
+	first = next((k for k in keys if k != -1), 0)
+	keys = [first if k == -1 else k for k in keys]
+	return keys,items,ismat
+
+def getSurfaceOrder(keys):
+	#stable sort of faces by surface so every material is one contiguous range
+	return sorted(range(len(keys)), key=keys.__getitem__)
+
+def sortTriangles(ins,order):
+	#reorder the index buffer triangles to follow a face order from getSurfaceOrder
+	if len(ins) != len(order) * 3:
+		return ins
+	sins = []
+	for f in order:
+		sins.extend(ins[f*3:f*3+3])
+	return sins
+
+def collectSurfaces(mesh,order=None):
+	#surface ranges over the faces, in mesh order or in the given face order
+	keys,items,ismat = getFaceSurfaces(mesh)
+	if order is not None:
+		keys = [keys[f] for f in order]
+	start,end,mts,mats,uvimgs = [],[],[],[],[]
+	last = None
+	for f in range(len(keys)):
+		if keys[f] != last:
+			start.append(f * 3)
+			if last is not None:
+				end.append(f - (start[-2] // 3))
+			item = items[keys[f]]
+			if ismat == True:
+				mts.append(cleanupString(str(item.name)))
+				mats.append(item)
+			else:
+				uvimgs.append(item)
+			last = keys[f]
+	if last is not None:
+		end.append(len(keys) - (start[-1] // 3))
+	
+	return start,end,mts,mats,uvimgs
+
+surfaceCache = {}
+
+def getSurfaces(mesh,sortfaces=False):
+	#collectSurfaces for a mesh being exported, computed once and shared by every caller
+	#returns the surfaces and the face order (None when unsorted), the cache lives for one export
+	key = (mesh.as_pointer(),sortfaces)
+	if key not in surfaceCache:
+		order = None
+		if sortfaces == True:
+			keys = getFaceSurfaces(mesh)[0]
+			order = getSurfaceOrder(keys)
+		surfaceCache[key] = (collectSurfaces(mesh,order),order)
+		if sortfaces == True:
+			before = len([f for f in range(len(keys)) if f == 0 or keys[f] != keys[f-1]])
+			print("%s: surfaces %i -> %i" % (mesh.name,before,len(surfaceCache[key][0][0])))
+	return surfaceCache[key]
+
+def dropSurfaces(mesh):
+	ptr = mesh.as_pointer()
+	for key in [k for k in surfaceCache if k[0] == ptr]:
+		del surfaceCache[key]
+	
+def writeInlineGeometry(file,name,Config,vs,uvlayers,ins,nr,tan):
+	#constructor and geometry of WriteClass8270 with the data written into the class
 	#if bytearray
 	if Config.ByClass == 1:
-		file.write("\t\tprivate var values:Vector.<uint>;\n")
+		if Config.ByteArrayEncoding == 1:
+			file.write("\t\tprivate var values:Vector.<uint>;\n")
 		file.write("\t\tprivate var bytedata:ByteArray = new ByteArray();\n")
 	
 	file.write("\t\tprivate var attributes:Array;\n\n")
-	file.write("\t\tpublic function "+obj.data.name+"() {\n\n")
+	file.write("\t\tpublic function "+name+"() {\n\n")
 	file.write("\t\t\tattributes = [\n")
 
 	if len(vs) > 0:
@@ -954,222 +1782,247 @@ def WriteClass8270(file,obj,Config):
 			
 	file.write("\t\t\tg.numVertices = "+str(len(vs))+";\n\n")
 	
-	if Config.ByClass == 0:
+	if (Config.ByClass == 0) and (Config.InterleaveStream == True):
+		writeInterleavedStream(file,Config,vs,uvlayers,ins,nr,tan)
+	elif Config.ByClass == 0:
 		if len(vs) > 0:
-			file.write("\t\t\tvar vertices:Array = [\n")
-			for v in vs:
-				file.write("\t\t\t\t%.6g, %.6g, %.6g,\n" % (v[0],v[1],v[2]))
+			file.write("\t\t\tvar vertices:Vector.<Number> = new <Number>[\n")
+			file.write(formatRows("%.6g, %.6g, %.6g",vs))
 			file.write("\t\t\t];\n")
 		else:
-			file.write("\t\t\tvar vertices:Array = new Array();\n")
+			file.write("\t\t\tvar vertices:Vector.<Number> = new Vector.<Number>();\n")
 		
 		if (len(uvlayers) > 0) and (Config.ExportUV == 1):
 			j=0
 			for uvname, uvdata in uvlayers.items():
 				if j <= 7:
-					file.write("\t\t\tvar uvlayer"+str(j)+":Array = [\n")
-					for u in uvdata[0]:
-						file.write("\t\t\t\t%.4g,%.4g,\n" % (u[0],u[1]))
+					file.write("\t\t\tvar uvlayer"+str(j)+":Vector.<Number> = new <Number>[\n")
+					file.write(formatRows("%.4g,%.4g",uvdata[0]))
 					file.write("\t\t\t];\n")
 					j=j+1
 		else:
-			file.write("\t\t\tvar uvlayer:Array = new Array();\n")
+			file.write("\t\t\tvar uvlayer:Vector.<Number> = new Vector.<Number>();\n")
 		
 		if len(ins) > 0:
-			file.write("\t\t\tvar ind:Array = [\n")
-			x=0
-			for t in ins:
-				if x == 0:
-					file.write("\t\t\t\t")
-				file.write("%i," % (t))
-				if x >= 2:
-					file.write("\n")
-					x=-1
-				x = x+1
+			file.write("\t\t\tvar ind:Vector.<uint> = new <uint>[\n")
+			file.write(formatIndexRows(ins))
 			file.write("\t\t\t];\n")
 		else:
-			file.write("\t\t\tvar ind:Array = new Array();\n")
+			file.write("\t\t\tvar ind:Vector.<uint> = new Vector.<uint>();\n")
 		
 		if (len(nr) > 0) and (Config.ExportNormals == 1):
-			file.write("\t\t\tvar normals:Array = [\n")
-			for n in nr:
-				file.write("\t\t\t\t%.6g, %.6g, %.6g,\n" % (n[0],n[1],n[2]))
+			file.write("\t\t\tvar normals:Vector.<Number> = new <Number>[\n")
+			file.write(formatRows("%.6g, %.6g, %.6g",nr))
 			file.write("\t\t\t];\n")
 		else:
-			file.write("\t\t\tvar normals:Array = new Array();\n")
+			file.write("\t\t\tvar normals:Vector.<Number> = new Vector.<Number>();\n")
 			
 		if (len(tan) > 0) and (Config.ExportTangents == 1):
-			file.write("\t\t\tvar tangent:Array = [\n")
-			for t in tan:
-				file.write("\t\t\t\t%.6g, %.6g, %.6g, %.6g,\n" % (t[0],t[1],t[2],-1))
+			file.write("\t\t\tvar tangent:Vector.<Number> = new <Number>[\n")
+			file.write(formatRows("%.6g, %.6g, %.6g, %.6g",tan))
 			file.write("\t\t\t];\n")
 		else:
-			file.write("\t\t\tvar tangent:Array = new Array();\n\n")
+			file.write("\t\t\tvar tangent:Vector.<Number> = new Vector.<Number>();\n\n")
 		
-		file.write("\t\t\tg.setAttributeValues(VertexAttributes.POSITION, Vector.<Number>(vertices));\n")
+		file.write("\t\t\tg.setAttributeValues(VertexAttributes.POSITION, vertices);\n")
 		if (len(uvlayers) > 0) and (Config.ExportUV == 1):
 			j=0
 			for uvname, uvdata in uvlayers.items():
 				if j <= 7:
 					#file.write("\t\t\t//%s\n" % uvname)
-					file.write("\t\t\tg.setAttributeValues(VertexAttributes.TEXCOORDS["+str(j)+"], Vector.<Number>(uvlayer"+str(j)+"));\n")
+					file.write("\t\t\tg.setAttributeValues(VertexAttributes.TEXCOORDS["+str(j)+"], uvlayer"+str(j)+");\n")
 					j=j+1
 		else:
-			file.write("\t\t\t//g.setAttributeValues(VertexAttributes.TEXCOORDS[0], Vector.<Number>(uvlayer));\n")	
+			file.write("\t\t\t//g.setAttributeValues(VertexAttributes.TEXCOORDS[0], uvlayer);\n")	
 			
 		if (len(nr) > 0) and (Config.ExportNormals == 1):
-			file.write("\t\t\tg.setAttributeValues(VertexAttributes.NORMAL, Vector.<Number>(normals));\n")
+			file.write("\t\t\tg.setAttributeValues(VertexAttributes.NORMAL, normals);\n")
 		else:
-			file.write("\t\t\t//g.setAttributeValues(VertexAttributes.NORMAL, Vector.<Number>(normals));\n")
+			file.write("\t\t\t//g.setAttributeValues(VertexAttributes.NORMAL, normals);\n")
 			
 		if (len(tan) > 0) and (Config.ExportTangents == 1):
-			file.write("\t\t\tg.setAttributeValues(VertexAttributes.TANGENT4, Vector.<Number>(tangent));\n")
+			file.write("\t\t\tg.setAttributeValues(VertexAttributes.TANGENT4, tangent);\n")
 		else:
-			file.write("\t\t\t//g.setAttributeValues(VertexAttributes.TANGENT4, Vector.<Number>(tangent));\n")
+			file.write("\t\t\t//g.setAttributeValues(VertexAttributes.TANGENT4, tangent);\n")
 		
-		file.write("\t\t\tg.indices =  Vector.<uint>(ind);\n\n")
+		file.write("\t\t\tg.indices = ind;\n\n")
 		if Config.A3DVersionSystem == 11:
 			file.write("\t\t\t//g.calculateNormals();\n")
 			file.write("\t\t\t//g.calculateTangents(0);\n")
 		file.write("\t\t\tthis.geometry = g;\n")
 	else:
-		writeByteArrayValues(file,vs,uvlayers,ins)
-		file.write("\t\t\tfor each(var b:uint in values)\n")
-		file.write("\t\t\t{\n")
-		file.write("\t\t\t\tbytedata.writeByte(b);\n")
-		file.write("\t\t\t}\n")
-		file.write("\t\t\tvar vertices:Array = new Array();\n")
+		writeByteArrayValues(file,vs,uvlayers,ins,Config)
+		file.write("\t\t\tvar vertices:Vector.<Number> = new Vector.<Number>();\n")
 		j=0
 		for uvname, uvdata in uvlayers.items():
 			if j <= 7:
-				file.write("\t\t\tvar uvlayer"+str(j)+":Array = new Array();\n")
+				file.write("\t\t\tvar uvlayer"+str(j)+":Vector.<Number> = new Vector.<Number>();\n")
 				j=j+1
-		file.write("\t\t\tvar ind:Array = new Array();\n")
+		file.write("\t\t\tvar ind:Vector.<uint> = new Vector.<uint>();\n")
 		file.write("\t\t\tbytedata.endian = Endian.LITTLE_ENDIAN;\n")
 		file.write("\t\t\tbytedata.uncompress();\n")
 		file.write("\t\t\tbytedata.position=0;\n")
+		quantpos,quantuv,shortindices = getByteArrayPrecision(Config,vs)
 		file.write("\t\t\tvar vlen:uint = bytedata.readUnsignedShort();\n")
 		file.write("\t\t\tg.numVertices = vlen/3;\n")
-		file.write("\t\t\tfor(var i:int = 0; i < vlen; i++){vertices.push(bytedata.readFloat());}\n")
+		if quantpos == True:
+			file.write("\t\t\tvar vmin:Array = [bytedata.readFloat(), bytedata.readFloat(), bytedata.readFloat()];\n")
+			file.write("\t\t\tvar vscale:Array = [bytedata.readFloat(), bytedata.readFloat(), bytedata.readFloat()];\n")
+			file.write("\t\t\tfor(var i:int = 0; i < vlen; i++){vertices.push(vmin[i%3] + bytedata.readUnsignedShort()*vscale[i%3]);}\n")
+		else:
+			file.write("\t\t\tfor(var i:int = 0; i < vlen; i++){vertices.push(bytedata.readFloat());}\n")
 		j=0
 		for uvname, uvdata in uvlayers.items():
 			if j <= 7:
 				file.write("\t\t\tvar uvlen:uint = bytedata.readUnsignedShort();\n")
-				file.write("\t\t\tfor(var x:int = 0; x < uvlen; x++){uvlayer"+str(j)+".push(bytedata.readFloat());}\n")
+				if quantuv == True:
+					file.write("\t\t\tvar uvmin"+str(j)+":Array = [bytedata.readFloat(), bytedata.readFloat()];\n")
+					file.write("\t\t\tvar uvscale"+str(j)+":Array = [bytedata.readFloat(), bytedata.readFloat()];\n")
+					file.write("\t\t\tfor(var x:int = 0; x < uvlen; x++){uvlayer"+str(j)+".push(uvmin"+str(j)+"[x%2] + bytedata.readUnsignedShort()*uvscale"+str(j)+"[x%2]);}\n")
+				else:
+					file.write("\t\t\tfor(var x:int = 0; x < uvlen; x++){uvlayer"+str(j)+".push(bytedata.readFloat());}\n")
 				j=j+1
 		file.write("\t\t\tvar ilen:uint = bytedata.readUnsignedShort();\n")
-		file.write("\t\t\tfor(var j:int = 0; j < ilen; j++){ind.push(bytedata.readUnsignedInt());}\n")
-		file.write("\t\t\tg.setAttributeValues(VertexAttributes.POSITION, Vector.<Number>(vertices));\n")
+		if shortindices == True:
+			file.write("\t\t\tfor(var j:int = 0; j < ilen; j++){ind.push(bytedata.readUnsignedShort());}\n")
+		else:
+			file.write("\t\t\tfor(var j:int = 0; j < ilen; j++){ind.push(bytedata.readUnsignedInt());}\n")
+		file.write("\t\t\tg.setAttributeValues(VertexAttributes.POSITION, vertices);\n")
 		j=0
 		for uvname, uvdata in uvlayers.items():
 			if j <= 7:
-				file.write("\t\t\tif(uvlen > 0){g.setAttributeValues(VertexAttributes.TEXCOORDS["+str(j)+"], Vector.<Number>(uvlayer"+str(j)+"));}\n")
+				file.write("\t\t\tif(uvlen > 0){g.setAttributeValues(VertexAttributes.TEXCOORDS["+str(j)+"], uvlayer"+str(j)+");}\n")
 				j=j+1
-		file.write("\t\t\tg.indices =  Vector.<uint>(ind);\n\n")
+		file.write("\t\t\tg.indices = ind;\n\n")
 		file.write("\t\t\tg.calculateNormals();\n")
 		file.write("\t\t\tg.calculateTangents(0);\n")
 		file.write("\t\t\tthis.geometry = g;\n")
 
-	start,end,mts,mats,uvimgs = collectSurfaces(mesh)
+def writeInterleavedStream(file,Config,vs,uvlayers,ins,nr,tan):
+	#one float list in the order of the attributes array, written straight into the
+	#vertex stream instead of being scattered per attribute by setAttributeValues
+	fmt = ["%.6g, %.6g, %.6g"]
+	haspos = len(vs) > 0
+	uvts = [uvdata[0] for uvname, uvdata in uvlayers.items()] if Config.ExportUV == 1 else []
+	hasnormals = (len(nr) > 0) and (Config.ExportNormals == 1)
+	hastangents = (len(tan) > 0) and (Config.ExportTangents == 1)
+	fmt.extend(["%.4g,%.4g"] * len(uvts))
+	#normal and tangent are always in the attributes, zero when not exported
+	fmt.extend(["%.6g, %.6g, %.6g","%.6g, %.6g, %.6g, %.6g"])
+	
+	rows = []
+	for j in range(len(vs)):
+		row = [vs[j][0],vs[j][1],vs[j][2]]
+		for uvt in uvts:
+			row.extend((uvt[j][0],uvt[j][1]))
+		row.extend((nr[j][0],nr[j][1],nr[j][2]) if hasnormals else (0,0,0))
+		row.extend((tan[j][0],tan[j][1],tan[j][2],tan[j][3]) if hastangents else (0,0,0,0))
+		rows.append(row)
+	
+	if haspos:
+		file.write("\t\t\tvar stream:Vector.<Number> = new <Number>[\n")
+		file.write(formatRows(", ".join(fmt),rows))
+		file.write("\t\t\t];\n")
+		file.write("\t\t\tvar data:ByteArray = g._vertexStreams[0].data;\n")
+		file.write("\t\t\tdata.position = 0;\n")
+		file.write("\t\t\tfor(var i:int = 0; i < stream.length; i++){data.writeFloat(stream[i]);}\n")
 	
-	if len(mts) > 0:
-		for x in range(len(mts)):
-			file.write("\t\t\tthis.addSurface("+mts[x]+", "+str(start[x])+", "+str(end[x])+");\n")
+	if len(ins) > 0:
+		file.write("\t\t\tvar ind:Vector.<uint> = new <uint>[\n")
+		file.write(formatIndexRows(ins))
+		file.write("\t\t\t];\n")
 	else:
-		file.write("\t\t\t//this.addSurface(new FillMaterial(0xFF0000), 0, "+str(len(ins))+");\n")
-	
-	file.write("\t\t\tthis.calculateBoundBox();\n")
-	writeTransform(file,obj,Config)
-	writeBoundBox(file,bb,Config)
-	file.write("\t\t}\n")
-	file.write("\t}\n")
-
-def collectSurfaces(mesh):
+		file.write("\t\t\tvar ind:Vector.<uint> = new Vector.<uint>();\n")
+	file.write("\t\t\tg.indices = ind;\n\n")
+	file.write("\t\t\tthis.geometry = g;\n")
+
+def writeEmbeddedGeometry(file,name,Config,vs,uvlayers,ins,nr,tan):
+	#geometry goes to <mesh>.bin next to the .as, laid out like the vertex stream so
+	#the constructor copies it with one readBytes instead of decoding every value
+	uvnames = list(uvlayers.keys())[:8] if Config.ExportUV == 1 else []
+	hasnormals = (len(nr) > 0) and (Config.ExportNormals == 1)
+	hastangents = (len(tan) > 0) and (Config.ExportTangents == 1)
+	
+	stream = []
+	for j in range(len(vs)):
+		stream.extend((vs[j][0],vs[j][1],vs[j][2]))
+		for uvname in uvnames:
+			uv = uvlayers[uvname][0][j]
+			stream.extend((uv[0],uv[1]))
+		if hasnormals:
+			stream.extend((nr[j][0],nr[j][1],nr[j][2]))
+		if hastangents:
+			stream.extend((tan[j][0],tan[j][1],tan[j][2],tan[j][3]))
+	
+	binfile = open(os.path.join(os.path.dirname(Config.filePath),name+".bin"),'wb')
+	binfile.write(pack("<II",len(vs),len(ins)))
+	binfile.write(pack("<%if" % len(stream),*stream))
+	binfile.write(pack("<%iI" % len(ins),*ins))
+	binfile.close()
+	
+	file.write('\t\t[Embed(source="'+name+'.bin", mimeType="application/octet-stream")] private static const GeometryData:Class;\n\n')
+	file.write("\t\tpublic function "+name+"() {\n\n")
+	file.write("\t\t\tvar attributes:Array = [\n")
+	file.write("\t\t\t\tVertexAttributes.POSITION,\n" * 3)
+	for j in range(len(uvnames)):
+		file.write(("\t\t\t\tVertexAttributes.TEXCOORDS["+str(j)+"],\n") * 2)
+	if hasnormals:
+		file.write("\t\t\t\tVertexAttributes.NORMAL,\n" * 3)
+	if hastangents:
+		file.write("\t\t\t\tVertexAttributes.TANGENT4,\n" * 4)
+	file.write("\t\t\t];\n")
+	file.write("\t\t\tvar data:ByteArray = new GeometryData() as ByteArray;\n")
+	file.write("\t\t\tdata.endian = Endian.LITTLE_ENDIAN;\n")
+	file.write("\t\t\tvar numVertices:uint = data.readUnsignedInt();\n")
+	file.write("\t\t\tvar numIndices:uint = data.readUnsignedInt();\n")
+	file.write("\t\t\tvar g:Geometry = new Geometry();\n")
+	file.write("\t\t\tg.addVertexStream(attributes);\n")
+	file.write("\t\t\tg.numVertices = numVertices;\n")
+	file.write("\t\t\tdata.readBytes(g._vertexStreams[0].data, 0, numVertices*attributes.length*4);\n")
+	file.write("\t\t\tvar ind:Vector.<uint> = new Vector.<uint>(numIndices);\n")
+	file.write("\t\t\tfor(var i:int = 0; i < numIndices; i++){ind[i] = data.readUnsignedInt();}\n")
+	file.write("\t\t\tg.indices = ind;\n\n")
+	file.write("\t\t\tthis.geometry = g;\n")
+
+def formatRows(fmt,rows):
+	#body of an AS array literal as one string, one row per line
+	line = "\t\t\t\t"+fmt+",\n"
+	return "".join([line % tuple(r) for r in rows])
+
+def formatIndexRows(ins):
+	#index array body, one triangle per line
+	full = len(ins) - len(ins) % 3
+	out = ["\t\t\t\t%i,%i,%i,\n" % (ins[x],ins[x+1],ins[x+2]) for x in range(0,full,3)]
+	if full < len(ins):
+		out.append("\t\t\t\t" + "".join(["%i," % t for t in ins[full:]]))
+	return "".join(out)
+
+def formatFaces(Config,mesh,mefdata,uvlayer,mati,facestart,vertexstart):
+	#addFace blocks of the 7.x exporters built as one string
+	verts = [v.co[:] for v in mesh.vertices]
 	Materials = mesh.materials
-	c=0
-	triangles = -1
-	lastmat = None
-	lastimg = None
-	start,end,items,mts,mats,uvimgs = [],[],[],[],[],[]
-	if checkBMesh() == True:
-		mefdata = mesh.polygons
-	else:
-		mefdata = mesh.faces
-	
-	if len(Materials) > 0:
-		for face in mefdata:
-			triangles = triangles + 1
-			if face.material_index <= len(Materials)-1:
-				srcmat = Materials[face.material_index]
-				if srcmat not in items:
-					start.append(face.index * 3)
-					if c != 0:
-						end.append(triangles)
-						triangles = 0
-					mts.append(cleanupString(str(srcmat.name)))
-					mats.append(srcmat)
-				else:
-					if srcmat != lastmat:
-						start.append(face.index * 3)
-						if c != 0:
-							end.append(triangles)
-							triangles = 0
-						mts.append(cleanupString(str(srcmat.name)))
-						mats.append(srcmat)
-				lastmat = srcmat
-				items.append(srcmat)
-				c = c+1
-		end.append(triangles+1)
-	else:
-		#no materials/tex slots
-		#get active uv layer, per face image
-		mesh.update(calc_tessface=True)
-		if len(mesh.tessface_uv_textures) > 0:
-			#for uvlayer in mesh.tessface_uv_textures:
-			#uvlayer = mesh.tessface_uv_textures[0]
-			uvlayer = mesh.tessface_uv_textures.active
-			fc = 0
-			for face in uvlayer.data:
-				triangles = triangles + 1
-				if face.image not in items:
-					start.append(fc * 3)
-					if c != 0:
-						end.append(triangles)
-						triangles = 0
-					uvimgs.append(face.image)
-				else:
-					if face.image != lastimg:
-						start.append(fc * 3)
-						if c != 0:
-							end.append(triangles)
-							triangles = 0
-						uvimgs.append(face.image)
-				lastimg = face.image
-				items.append(face.image)	
-				c = c+1
-				fc=fc+1
-			end.append(triangles+1)
-		
-		#mesh.update(calc_tessface=True)
-		#if len(mesh.tessface_uv_textures) > 0:
-		#	uvlayer = mesh.tessface_uv_textures[0]
-		#	fc = 0
-		#	for face in uvlayer.data:
-		#		triangles = triangles + 1
-		#		start.append(fc * 3)
-		#		end.append(triangles)
-		#		triangles = 0
-		#		uvimgs.append(face.image)
-		#		fc=fc+1
-
-	#print(start)
-	#print(end)
-	#print(mts)
-	#print(mats)
-	#print(uvimgs)
-	
-	return start,end,mts,mats,uvimgs
-	
+	hasFaceUV = len(mesh.uv_textures) > 0
+	out = []
+	for face in mefdata:
+		out.append(facestart)
+		if (hasFaceUV) and (Config.ExportUV == 1):
+			faceuv = uvlayer.data[face.index].uv
+			for i in range(len(face.vertices)):
+				co = verts[face.vertices[i]]
+				out.append(vertexstart+'%f, %f, %f, %f, %f),\n' % (co[0], co[1], co[2], faceuv[i][0], 1.0 - faceuv[i][1]))
+		else:
+			for i in range(len(face.vertices)):
+				co = verts[face.vertices[i]]
+				out.append(vertexstart+'%f, %f, %f, 0, 0),\n' % (co[0], co[1], co[2]))
+		if hasFaceUV and mati[face.material_index]:
+			out.append('\t\t\t\t]),'+mati[face.material_index]+');\n\n')
+		elif len(Materials) > 0:
+			Diffuse = list(Materials[face.material_index].diffuse_color)
+			out.append('\t\t\t\t]),new FillMaterial('+rgb2hex((Diffuse[0], Diffuse[1], Diffuse[2]))+'));\n\n')
+		else:
+			out.append('\t\t\t\t]),new FillMaterial(0xFF0000));\n\n')
+	return "".join(out)
+
 def WriteClass78(file,obj,Config):
 	file.write("\tpublic class "+obj.data.name+" extends Mesh {\n\n")
 		
@@ -1189,37 +2042,7 @@ def WriteClass78(file,obj,Config):
 		vs,uvlayers,ins,nr,tan,bb,trns = getCommonDataNoBmesh(Config,obj)
 		uvlayer = mesh.uv_textures.active
 		
-	cn=-1
-	for face in mefdata:
-		cn +=1
-		file.write('\t\t\t\taddFace(Vector.<Vertex>([\n')
-		if len(face.vertices) > 0:
-			for i in range(len(face.vertices)):
-				hasFaceUV = len(mesh.uv_textures) > 0
-				if (hasFaceUV) and (Config.ExportUV == 1):
-					#uv = [mesh.uv_textures.active.data[face.index].uv[i][0], mesh.uv_textures.active.data[face.index].uv[i][1]]
-					uv = [uvlayer.data[face.index].uv[i][0], uvlayer.data[face.index].uv[i][1]]
-					uv[1] = 1.0 - uv[1]
-					file.write('\t\t\t\t\taddVertex(%f, %f, %f, %f, %f),\n' % (verts[face.vertices[i]].co.x, verts[face.vertices[i]].co.y, verts[face.vertices[i]].co.z, uv[0], uv[1]) )
-				else:
-					file.write('\t\t\t\t\taddVertex(%f, %f, %f, 0, 0),\n' % (verts[face.vertices[i]].co.x, verts[face.vertices[i]].co.y, verts[face.vertices[i]].co.z) )
-		if hasFaceUV:
-			if mati[face.material_index]:
-				file.write('\t\t\t\t]),'+mati[face.material_index]+');\n\n')
-			else:
-				if len(Materials) > 0:
-					Diffuse = list(Materials[face.material_index].diffuse_color)
-					Diffuse.append(Materials[face.material_index].alpha)
-					file.write('\t\t\t\t]),new FillMaterial('+rgb2hex((Diffuse[0], Diffuse[1], Diffuse[2]))+'));\n\n')
-				else:
-					file.write('\t\t\t\t]),new FillMaterial(0xFF0000));\n\n')
-		else:
-			if len(Materials) > 0:
-				Diffuse = list(Materials[face.material_index].diffuse_color)
-				Diffuse.append(Materials[face.material_index].alpha)
-				file.write('\t\t\t\t]),new FillMaterial('+rgb2hex((Diffuse[0], Diffuse[1], Diffuse[2]))+'));\n\n')
-			else:
-				file.write('\t\t\t\t]),new FillMaterial(0xFF0000));\n\n')
+	file.write(formatFaces(Config,mesh,mefdata,uvlayer,mati,'\t\t\t\taddFace(Vector.<Vertex>([\n','\t\t\t\t\taddVertex('))
 
 	if Config.A3DVersionSystem == 4:
 		#7.6.0
@@ -1256,34 +2079,7 @@ def WriteClass75(file,obj,Config):
 		vs,uvlayers,ins,nr,tan,bb,trns = getCommonDataNoBmesh(Config,obj)
 		uvlayer = mesh.uv_textures.active
 		
-	for face in mefdata:
-		file.write('\t\t\t\tg.addFace(Vector.<Vertex>([\n')
-		for i in range(len(face.vertices)):
-			hasFaceUV = len(mesh.uv_textures) > 0
-			if (hasFaceUV) and (Config.ExportUV == 1):
-				#uv = [mesh.uv_textures.active.data[face.index].uv[i][0], mesh.uv_textures.active.data[face.index].uv[i][1]]
-				uv = [uvlayer.data[face.index].uv[i][0], uvlayer.data[face.index].uv[i][1]]
-				uv[1] = 1.0 - uv[1]
-				file.write('\t\t\t\t\tg.addVertex(%f, %f, %f, %f, %f),\n' % (verts[face.vertices[i]].co.x, verts[face.vertices[i]].co.y, verts[face.vertices[i]].co.z, uv[0], uv[1]) )
-			else:
-				file.write('\t\t\t\t\tg.addVertex(%f, %f, %f, 0, 0),\n' % (verts[face.vertices[i]].co.x, verts[face.vertices[i]].co.y, verts[face.vertices[i]].co.z) )
-		if hasFaceUV:
-			if mati[face.material_index]:
-				file.write('\t\t\t\t]),'+mati[face.material_index]+');\n\n')
-			else:
-				if len(Materials) > 0:
-					Diffuse = list(Materials[face.material_index].diffuse_color)
-					Diffuse.append(Materials[face.material_index].alpha)
-					file.write('\t\t\t\t]),new FillMaterial('+rgb2hex((Diffuse[0], Diffuse[1], Diffuse[2]))+'));\n\n')
-				else:
-					file.write('\t\t\t\t]),new FillMaterial(0xFF0000));\n\n')
-		else:
-			if len(Materials) > 0:
-				Diffuse = list(Materials[face.material_index].diffuse_color)
-				Diffuse.append(Materials[face.material_index].alpha)
-				file.write('\t\t\t\t]),new FillMaterial('+rgb2hex((Diffuse[0], Diffuse[1], Diffuse[2]))+'));\n\n')
-			else:
-				file.write('\t\t\t\t]),new FillMaterial(0xFF0000));\n\n')
+	file.write(formatFaces(Config,mesh,mefdata,uvlayer,mati,'\t\t\t\tg.addFace(Vector.<Vertex>([\n','\t\t\t\t\tg.addVertex('))
 	
 	file.write("\t\t\t//g.weldVertices();\n")
 	file.write("\t\t\t//g.weldFaces();\n")
@@ -1310,53 +2106,25 @@ def WriteClass5(file,obj,Config):
 		vs,uvlayers,ins,nr,tan,bb,trns = getCommonDataNoBmesh(Config,obj,False)
 
 	if len(vs) > 0:
-		count = 0
-		for v in vs:
-			file.write("\t\t\tcreateVertex(%.6g, %.6g, %.6g, %i);\n" % (v[0],v[1],v[2],count))
-			count += 1
+		file.write("".join(["\t\t\tcreateVertex(%.6g, %.6g, %.6g, %i);\n" % (vs[i][0],vs[i][1],vs[i][2],i) for i in range(len(vs))]))
 		file.write('\n')
 		
 	if len(ins) > 0:
-		count = 0
-		file.write('\t\t\tcreateFace([')
-		x=0
-		j=0
-		for t in ins:
-			file.write("%i" % (t))
-			if x==2:
-				x=0
-				file.write('], '+str(j)+');\n')
-				j=j+1
-				if count < len(ins)-1:
-					file.write('\t\t\tcreateFace([')
-			else:
-				file.write(',')
-				x=x+1
-			count += 1
-			
-	facecount = j
+		#one createFace per triangle, a trailing partial triangle is left open like before
+		full = len(ins) - len(ins) % 3
+		faces = ["%i,%i,%i], %i);\n" % (ins[x],ins[x+1],ins[x+2],x//3) for x in range(0,full,3)]
+		if full < len(ins):
+			faces.append("".join(["%i," % t for t in ins[full:]]))
+		file.write('\t\t\tcreateFace([' + '\t\t\tcreateFace(['.join(faces))
 	
 	if (len(uvlayers) > 0) and (Config.ExportUV == 1):
-		count = 0
-		file.write('\t\t\tsetUVsToFace(')
-		x=0
-		j=0
-		uvlayercount = 0
-		for uvname, uvdata in uvlayers.items():
-			if uvlayercount <= 0:
-				uvt = uvdata[0]
-				for u in uvt:
-					file.write('new Point(%f,%f), ' % (u[0],u[1]))
-					if x==2:
-						x=0
-						file.write('%i);\n' % j)
-						j=j+1
-						if count < len(uvt)-1:
-							file.write('\t\t\tsetUVsToFace(')
-					else:
-						x=x+1
-					count += 1
-				uvlayercount=uvlayercount+1
+		#only the first uv layer, one setUVsToFace per triangle
+		uvt = list(uvlayers.values())[0][0]
+		full = len(uvt) - len(uvt) % 3
+		faces = ['new Point(%f,%f), new Point(%f,%f), new Point(%f,%f), %i);\n' % (uvt[x][0],uvt[x][1],uvt[x+1][0],uvt[x+1][1],uvt[x+2][0],uvt[x+2][1],x//3) for x in range(0,full,3)]
+		if full < len(uvt):
+			faces.append("".join(['new Point(%f,%f), ' % (u[0],u[1]) for u in uvt[full:]]))
+		file.write('\t\t\tsetUVsToFace(' + '\t\t\tsetUVsToFace('.join(faces))
 		file.write('\n')
 		
 	x=0
@@ -1393,10 +2161,7 @@ def WriteClass5(file,obj,Config):
 	count = 0
 	for x in range(len(mts)):
 		file.write('\t\t\tcreateSurface([')
-		for i in range(len(fcs[x])):
-			file.write("%i" % (count+i))
-			if i != len(fcs[x])-1:
-				file.write(",")
+		file.write(",".join(["%i" % (count+i) for i in range(len(fcs[x]))]))
 		count = count + len(fcs[x])
 		file.write('], "'+mts[x]+'");\n')
 		file.write('\t\t\tsetMaterialToSurface('+mts[x]+', "'+mts[x]+'");\n')
@@ -1405,7 +2170,7 @@ def WriteClass5(file,obj,Config):
 	file.write("\t\t}\n")
 	file.write("\t}\n")
 
-def WriteDocuClass(ofile,objs,aobjs,Config,fp):
+def WriteDocuClass(ofile,objs,aobjs,Config,fp,linked=()):
 	fp = os.path.dirname(fp) + os.sep + "main.as"
 	
 	if os.path.exists(fp) == True:
@@ -1421,8 +2186,13 @@ def WriteDocuClass(ofile,objs,aobjs,Config,fp):
 		WriteDocPackageHeader(file,Config)
 		file.write("\tpublic class main extends Sprite {\n\n")
 		
-		for i, obj in enumerate(objs):
-			file.write("\t\tprivate var obj"+str(i)+":"+cleanupString(obj.data.name)+";\n\n")
+		#v8 scenes can build their objects a batch per frame instead of in the constructor
+		lazy = (Config.DocBatchSize > 0) and (Config.A3DVersionSystem >= 7)
+		if lazy == True:
+			writeDocObjectTable(file,[obj for obj in objs if "a3dtype" not in obj],linked)
+		else:
+			for i, obj in enumerate(objs):
+				file.write("\t\tprivate var obj"+str(i)+":"+getClassName(obj,linked)+";\n\n")
 		
 		#for obj in aobjs:
 		#	#print(obj["a3dtype"])
@@ -1452,7 +2222,7 @@ def WriteDocuClass(ofile,objs,aobjs,Config,fp):
 			file.write('\t\t\tcontroller.lookAt(new Point3D(0,0,0));\n\n')
 			
 			for i, obj in enumerate(objs):
-				file.write("\t\t\tobj"+str(i)+" = new "+cleanupString(obj.data.name)+"();\n")
+				file.write("\t\t\tobj"+str(i)+" = new "+getClassName(obj,linked)+"();\n")
 				file.write("\t\t\trootContainer.addChild(obj"+str(i)+");\n")
 			file.write("\n")
 			
@@ -1491,7 +2261,7 @@ def WriteDocuClass(ofile,objs,aobjs,Config,fp):
 			file.write("\t\t\tcontroller.lookAt(new Vector3D(0,0,0));\n\n")
 			
 			for i, obj in enumerate(objs):
-				file.write("\t\t\tobj"+str(i)+" = new "+cleanupString(obj.data.name)+"();\n")
+				file.write("\t\t\tobj"+str(i)+" = new "+getClassName(obj,linked)+"();\n")
 				file.write("\t\t\trootContainer.addChild(obj"+str(i)+");\n")
 			file.write("\n")
 			
@@ -1520,10 +2290,11 @@ def WriteDocuClass(ofile,objs,aobjs,Config,fp):
 			file.write("\t\t\tcontroller = new SimpleObjectController(stage,camera,100);\n")
 			file.write("\t\t\tcontroller.lookAt(new Vector3D(0,0,0));\n\n")
 			
-			for i, obj in enumerate(objs):
-				file.write("\t\t\tobj"+str(i)+" = new "+cleanupString(obj.data.name)+"();\n")
-				file.write("\t\t\trootContainer.addChild(obj"+str(i)+");\n")
-			file.write("\n")
+			if lazy == False:
+				for i, obj in enumerate(objs):
+					file.write("\t\t\tobj"+str(i)+" = new "+getClassName(obj,linked)+"();\n")
+					file.write("\t\t\trootContainer.addChild(obj"+str(i)+");\n")
+				file.write("\n")
 			
 			file.write("\t\t\tstage3D = stage.stage3Ds[0];\n")
 			file.write("\t\t\tstage3D.addEventListener(Event.CONTEXT3D_CREATE, onContextCreate);\n")
@@ -1538,8 +2309,12 @@ def WriteDocuClass(ofile,objs,aobjs,Config,fp):
 			file.write("\t\tprivate function onEnterFrame(e:Event):void {\n")
 			file.write("\t\t\tcamera.view.width = stage.stageWidth;\n")
 			file.write("\t\t\tcamera.view.height = stage.stageHeight;\n")		
+			if lazy == True:
+				file.write("\t\t\tbuildObjects("+str(Config.DocBatchSize)+");\n")
 			file.write("\t\t\tcamera.render(stage3D);\n")
 			file.write("\t\t}\n")
+			if lazy == True:
+				writeDocObjectBuilder(file)
 		else:
 			print("version not found")
 		
@@ -1547,12 +2322,46 @@ def WriteDocuClass(ofile,objs,aobjs,Config,fp):
 		WritePackageEnd(file)
 		file.close()
 	
+def writeDocObjectTable(file,objs,linked):
+	#exported class of every object by object name and the order they get built in
+	names = ['"'+obj.name.replace('"','\\"')+'"' for obj in objs]
+	file.write("\t\tprivate var classes:Object = {\n")
+	file.write(",\n".join(["\t\t\t"+names[i]+": "+getClassName(obj,linked) for i, obj in enumerate(objs)]))
+	file.write("\n\t\t};\n")
+	file.write("\t\tprivate var pending:Array = ["+", ".join(names)+"];\n")
+	file.write("\t\tprivate var built:Object = {};\n\n")
+
+def writeDocObjectBuilder(file):
+	file.write("\n")
+	file.write("\t\tprivate function buildObjects(count:int):void {\n")
+	file.write("\t\t\twhile(count > 0 && pending.length > 0){\n")
+	file.write("\t\t\t\tvar name:String = pending.shift();\n")
+	file.write("\t\t\t\tif(built[name] == null){\n")
+	file.write("\t\t\t\t\tgetObject(name);\n")
+	file.write("\t\t\t\t\tcount--;\n")
+	file.write("\t\t\t\t}\n")
+	file.write("\t\t\t}\n")
+	file.write("\t\t}\n\n")
+	file.write("\t\tpublic function getObject(name:String):Object3D {\n")
+	file.write("\t\t\tif(built[name] == null){\n")
+	file.write("\t\t\t\tvar obj:Object3D = new classes[name]();\n")
+	file.write("\t\t\t\trootContainer.addChild(obj);\n")
+	file.write("\t\t\t\tif(stage3D.context3D != null){\n")
+	file.write("\t\t\t\t\tfor each (var resource:Resource in obj.getResources(true)) {\n")
+	file.write("\t\t\t\t\t\tif(!resource.isUploaded){resource.upload(stage3D.context3D);}\n")
+	file.write("\t\t\t\t\t}\n")
+	file.write("\t\t\t\t}\n")
+	file.write("\t\t\t\tbuilt[name] = obj;\n")
+	file.write("\t\t\t}\n")
+	file.write("\t\t\treturn built[name];\n")
+	file.write("\t\t}\n")
+
 #==================================
 # A3D EXPORTER
 #==================================
 
 class A3DExporterSettings:
-	def __init__(self,filePath="",A3DVersionSystem=4,ExportMode=1,ExportUVLayer=2,CompressData=1,ExportAnim=0,ExportUV=1,ExportNormals=1,ExportTangents=1,ExportParentObj=0,ExportBoundBoxes=1,ExportHiddenItems=1,CopyImgs=1,ExportHierarchy=1):
+	def __init__(self,filePath="",A3DVersionSystem=4,ExportMode=1,ExportUVLayer=2,CompressData=1,ExportAnim=0,ExportUV=1,ExportNormals=1,ExportTangents=1,ExportParentObj=0,ExportBoundBoxes=1,ExportHiddenItems=1,CopyImgs=1,ExportHierarchy=1,DedupVertices=1,OptimiseVertexCache=0,SortSurfaces=1,IncrementalExport=0,ShareBuffers=1):
 		self.filePath = filePath
 		self.A3DVersionSystem = int(A3DVersionSystem)
 		self.ExportMode = int(ExportMode)
@@ -1567,6 +2376,92 @@ class A3DExporterSettings:
 		self.ExportHiddenItems = int(ExportHiddenItems)
 		self.ExportHierarchy = int(ExportHierarchy)
 		self.CopyImgs = int(CopyImgs)
+		self.DedupVertices = int(DedupVertices)
+		self.OptimiseVertexCache = int(OptimiseVertexCache)
+		self.SortSurfaces = int(SortSurfaces)
+		self.IncrementalExport = int(IncrementalExport)
+		self.ShareBuffers = int(ShareBuffers)
+		self.Manifest = None
+
+class A3DExportManifest:
+	#sidecar files next to the .a3d with the packed buffers of every mesh from the last export,
+	#<file>.manifest is a json index keyed by geometry hash and the settings that change the
+	#buffer bytes, <file>.manifest.bin holds the buffers and only new ones get appended to it
+	def __init__(self,filepath):
+		self.filepath = filepath + ".manifest"
+		self.binpath = self.filepath + ".bin"
+		self.entries = {}
+		self.used = {}
+		self.added = {}
+	
+	def load(self):
+		try:
+			with open(self.filepath,'r') as f:
+				data = json.load(f)
+			if (data["version"] == 2) and os.path.exists(self.binpath):
+				self.entries = data["entries"]
+		except Exception:
+			#missing, old or broken manifest, everything gets written from scratch
+			self.entries = {}
+	
+	def readBuffers(self,entry):
+		with open(self.binpath,'rb') as f:
+			f.seek(entry["ibuf"][0])
+			idata = f.read(entry["ibuf"][1])
+			f.seek(entry["vbuf"][0])
+			vdata = f.read(entry["vbuf"][1])
+		return idata,vdata
+	
+	def save(self):
+		#only keep what this export used so removed meshes drop out
+		size = os.path.getsize(self.binpath) if os.path.exists(self.binpath) else 0
+		live = sum([e["ibuf"][1] + e["vbuf"][1] for e in self.used.values()])
+		entries = dict(self.used)
+		if size - live > live:
+			#mostly buffers of removed meshes, rewrite the .bin with the live ones
+			kept = [(key,self.readBuffers(entry)) for key, entry in self.used.items()]
+			binfile = open(self.binpath,'wb')
+			offset = 0
+			for key, (idata,vdata) in kept:
+				entries[key] = dict(entries[key],ibuf=[offset,len(idata)],vbuf=[offset+len(idata),len(vdata)])
+				binfile.write(idata)
+				binfile.write(vdata)
+				offset += len(idata) + len(vdata)
+		else:
+			binfile = open(self.binpath,'ab')
+			offset = size
+		for key, (attributes,indexCount,idata,vertexCount,vdata) in self.added.items():
+			entries[key] = {"attributes":attributes,"indexCount":indexCount,"vertexCount":vertexCount,"ibuf":[offset,len(idata)],"vbuf":[offset+len(idata),len(vdata)]}
+			binfile.write(idata)
+			binfile.write(vdata)
+			offset += len(idata) + len(vdata)
+		binfile.close()
+		with open(self.filepath,'w') as f:
+			json.dump({"version":2,"entries":entries},f)
+		print("manifest: %i of %i meshes reused\n" % (len(self.used),len(entries)))
+	
+	def getKey(self,Config,mesh,key):
+		#key is getGeometryKey(Config,mesh), hashed once by the caller
+		if key is None:
+			return None
+		mats = tuple(m.name if m != None else None for m in mesh.materials)
+		return json.dumps(key + mats + (Config.A3DVersionSystem,Config.ExportUV,Config.ExportNormals,Config.ExportTangents,Config.DedupVertices,Config.SortSurfaces,Config.OptimiseVertexCache))
+	
+	def get(self,key):
+		if (key is None) or (key not in self.entries):
+			return None
+		entry = self.entries[key]
+		try:
+			idata,vdata = self.readBuffers(entry)
+		except IOError:
+			return None
+		if (len(idata) != entry["ibuf"][1]) or (len(vdata) != entry["vbuf"][1]):
+			return None
+		self.used[key] = entry
+		return (entry["attributes"],entry["indexCount"],idata,entry["vertexCount"],vdata)
+	
+	def put(self,key,entry):
+		self.added[key] = entry
 
 class A3DExporter(bpy.types.Operator):
 	bl_idname = "ops.a3dexporter"
@@ -1606,6 +2501,12 @@ class A3DExporter(bpy.types.Operator):
 	
 	ExportHierarchy = BoolProperty(name="Include Hierarchy", description="Export data hierarchically", default=True)
 	
+	DedupVertices = BoolProperty(name="Merge Duplicate Vertices", description="Write each unique vertex once and share it between faces", default=True)
+	OptimiseVertexCache = BoolProperty(name="Optimise Vertex Cache", description="Reorder triangles and vertices of each surface for the GPU vertex cache", default=False)
+	SortSurfaces = BoolProperty(name="One Surface Per Material", description="Sort triangles by material so each material is drawn as one surface", default=True)
+	IncrementalExport = BoolProperty(name="Incremental Export", description="Keep a .manifest file next to the export and reuse buffers of meshes that have not changed", default=False)
+	ShareBuffers = BoolProperty(name="Share Identical Buffers", description="Write identical index/vertex buffers once and share them between meshes", default=True)
+	
 	filepath = bpy.props.StringProperty()
 
 	def execute(self, context):
@@ -1618,7 +2519,7 @@ class A3DExporter(bpy.types.Operator):
 			print('Output file : %s' %filePath)
 			file = open(filePath, 'wb')
 			file.close()
-			Config = A3DExporterSettings(fp,A3DVersionSystem=self.A3DVersionSystem,ExportMode=self.ExportMode,ExportUVLayer=self.ExportUVLayer,CompressData=self.CompressData,ExportAnim=False,ExportUV=self.ExportUV,ExportNormals=self.ExportNormals,ExportTangents=self.ExportTangents,ExportParentObj=self.ExportParentObj,ExportBoundBoxes=self.ExportBoundBoxes,ExportHiddenItems=self.ExportHiddenItems,CopyImgs=self.CopyImgs,ExportHierarchy=self.ExportHierarchy)
+			Config = A3DExporterSettings(fp,A3DVersionSystem=self.A3DVersionSystem,ExportMode=self.ExportMode,ExportUVLayer=self.ExportUVLayer,CompressData=self.CompressData,ExportAnim=False,ExportUV=self.ExportUV,ExportNormals=self.ExportNormals,ExportTangents=self.ExportTangents,ExportParentObj=self.ExportParentObj,ExportBoundBoxes=self.ExportBoundBoxes,ExportHiddenItems=self.ExportHiddenItems,CopyImgs=self.CopyImgs,ExportHierarchy=self.ExportHierarchy,DedupVertices=self.DedupVertices,OptimiseVertexCache=self.OptimiseVertexCache,SortSurfaces=self.SortSurfaces,IncrementalExport=self.IncrementalExport,ShareBuffers=self.ShareBuffers)
 			file = open(filePath, 'ab')
 			
 			if self.A3DVersionSystem == "5":
@@ -1636,7 +2537,61 @@ class A3DExporter(bpy.types.Operator):
 		context.window_manager.fileselect_add(self)
 		return {'RUNNING_MODAL'}
 
+class A3DPreviewExporter(bpy.types.Operator):
+	bl_idname = "ops.a3dpreviewexporter"
+	bl_label = "Send A3D to Preview (Alternativa)"
+	bl_description = "Export the scene as A3D straight to a running preview player"
+	
+	PreviewTarget = StringProperty(name="Target", description="host:port of the preview player, a named pipe path, or - for stdout", default="localhost:9090")
+	
+	ExportModes = []
+	ExportModes.append(("1", "Selected Objects", ""))
+	ExportModes.append(("2", "All Objects", ""))
+	ExportMode = EnumProperty(name="Export", description="Select which objects to export", items=ExportModes, default="2")
+	
+	CompressData = BoolProperty(name="Compress Data", description="Zlib Compress data as per .a3d spec", default=False)
+
+	def execute(self, context):
+		stdout = sys.stdout
+		if self.PreviewTarget == "-":
+			#the package goes to stdout, so everything printed while exporting goes to stderr
+			stdout.flush()
+			sys.stdout = sys.stderr
+		try:
+			time1 = time.clock()
+			print('Preview target : %s' % self.PreviewTarget)
+			#nothing is written next to an export file, images are expected where the player already has them
+			Config = A3DExporterSettings("",A3DVersionSystem=1,ExportMode=self.ExportMode,CompressData=self.CompressData,CopyImgs=0,IncrementalExport=0)
+			stream = openPreviewStream(self.PreviewTarget,stdout)
+			try:
+				A3DExport2(stream,Config)
+				stream.flush()
+			finally:
+				if self.PreviewTarget != "-":
+					stream.close()
+			print(".a3d preview time: %.2f" % (time.clock() - time1))
+		except Exception as e:
+			print(e)
+		finally:
+			sys.stdout = stdout
+		return {'FINISHED'}
+	def invoke (self, context, event):
+		return context.window_manager.invoke_props_dialog(self)
+
+def openPreviewStream(target,stdout):
+	#writable binary stream for a preview target, - is stdout, host:port a tcp socket, anything else a path
+	if target == "-":
+		return stdout.buffer
+	host, sep, port = target.rpartition(":")
+	if sep and port.isdigit() and not os.path.exists(target):
+		sock = socket.create_connection((host or "localhost",int(port)))
+		stream = sock.makefile('wb')
+		sock.close()
+		return stream
+	return open(target,'wb')
+
 def A3DExport1(file,Config):
+	surfaceCache.clear()
 	if Config.ExportMode == 1:
 		#get selected objects that are mesh
 		objs = [obj for obj in bpy.context.selected_objects if obj.type == 'MESH']
@@ -1655,11 +2610,12 @@ def A3DExport1(file,Config):
 	materials = []
 	objects = []
 	
+	triangulated = {}
 	if len(objs) > 0:
 		print("Exporting meshes...\n")
-		for obj in objs:
-			#convert to triangles
-			ConvertQuadsToTris(obj)
+		for tobj in objs:
+			#convert to triangles, users of the same mesh share one copy
+			obj = getSharedTriangulatedObject(tobj,triangulated)
 		
 			#data
 			mesh = obj.data
@@ -1669,8 +2625,9 @@ def A3DExport1(file,Config):
 				vs,uvlayers,ins,nr,tan,bb,trns = getCommonData(Config,obj)
 			else:
 				vs,uvlayers,ins,nr,tan,bb,trns = getCommonDataNoBmesh(Config,obj)
+			tan = getTangents(Config,vs,uvlayers,ins,nr)
 			#get surface data
-			start,end,mts,mats,uvimgs = collectSurfaces(mesh)
+			(start,end,mts,mats,uvimgs),order = getSurfaces(mesh)
 					
 			#create mesh boundbox
 			a3dbox = A3DBox(Config)
@@ -1715,7 +2672,7 @@ def A3DExport1(file,Config):
 					a3dvbuf._byteBuffer.append(tan[j][0]) #tan1
 					a3dvbuf._byteBuffer.append(tan[j][1]) #tan2
 					a3dvbuf._byteBuffer.append(tan[j][2]) #tan3
-					a3dvbuf._byteBuffer.append(-1) #tan4 - static input handedness
+					a3dvbuf._byteBuffer.append(tan[j][3]) #tan4 - handedness
 				j = j +1
 			a3dvbuf._vertexCount = int(len(vs)) #this works for cube
 			vbuffers.append(a3dvbuf)
@@ -1783,14 +2740,21 @@ def A3DExport1(file,Config):
 			a3dobj._transformation = a3dtrans
 			a3dobj._visible = 1
 			objects.append(a3dobj)
+			
+			if tobj.data.name not in triangulated:
+				freeTriangulatedObject(obj)
+		for obj in triangulated.values():
+			freeTriangulatedObject(obj)
 	
 	a3d = A3D(boxes,geometries,images,maps,materials,objects,Config)
 	a3d.write(file)
 	
+	surfaceCache.clear()
 	print('Export Completed...\n')
 
 def A3DExport2(file,Config):
 	print('Export to Alternativa3d binary started...\n')
+	surfaceCache.clear()
 			
 	if Config.ExportMode == 1:
 		#export selected only
@@ -1823,9 +2787,6 @@ def A3DExport2(file,Config):
 			if obj.type == 'EMPTY':
 				objs_empties.append(obj)
 	
-	#now we have objs, set first selected object to active, so we have some context
-	bpy.context.scene.objects.active = bpy.context.selected_objects[0]
-	
 	ambientLights = []
 	animationClips = []
 	animationTracks = []
@@ -1853,10 +2814,15 @@ def A3DExport2(file,Config):
 	#for ids
 	mesh_objects = []
 	
-	linkedimgdata = {}
+	#images, maps and materials are shared across the whole export
+	exportindex = A3DExportIndex(Config,images,maps,materials)
 	linkedimg = False
 	linkeddata = {}
 	linkedmesh = False
+	copy_set = set()
+	if Config.IncrementalExport == 1:
+		Config.Manifest = A3DExportManifest(Config.filePath)
+		Config.Manifest.load()
 	
 	#a3d custom objs
 	if len(objs_a3ditems) > 0:
@@ -1864,7 +2830,7 @@ def A3DExport2(file,Config):
 			if obj["a3dtype"] == 'A3DSprite3D':
 				print('A3DSprite3D Found')
 				mesh = obj.data
-				start,end,mts,mats,uvimgs = collectSurfaces(mesh)
+				(start,end,mts,mats,uvimgs),order = getSurfaces(mesh)
 				
 				#create material
 				if Config.ExportBoundBoxes == 1:
@@ -1982,11 +2948,13 @@ def A3DExport2(file,Config):
 						if "a3ddistance" in childobj:
 							me = childobj.data
 							
-							childobj.select = True
-							bpy.context.scene.objects.active = childobj
-							ConvertQuadsToTris(childobj)
-							
-							a3dmesh = createMesh(Config,childobj,linkedimgdata,linkedimg,linkeddata,linkedmesh,decals,meshes,objects,mesh_objects,boxes,indexBuffers,images,maps,materials,vertexBuffers)
+							if isLinkedCopy(childobj,linkeddata):
+								#buffers and surfaces come from the first user, nothing to triangulate
+								a3dmesh = createMesh(Config,childobj,exportindex,linkedimg,linkeddata,linkedmesh,decals,meshes,objects,mesh_objects,boxes,indexBuffers,images,maps,materials,vertexBuffers)
+							else:
+								tobj = getTriangulatedObject(childobj)
+								a3dmesh = createMesh(Config,tobj,exportindex,linkedimg,linkeddata,linkedmesh,decals,meshes,objects,mesh_objects,boxes,indexBuffers,images,maps,materials,vertexBuffers)
+								freeTriangulatedObject(tobj)
 							
 							lodobjects.append(a3dmesh._id)
 							distances.append(int(childobj["a3ddistance"]))
@@ -2040,10 +3008,10 @@ def A3DExport2(file,Config):
 					
 			elif obj["a3dtype"] == 'A3DSkybox':
 				print("skybox")
-				a3dmesh = createMesh(Config,obj,linkedimgdata,linkedimg,linkeddata,linkedmesh,decals,meshes,objects,mesh_objects,boxes,indexBuffers,images,maps,materials,vertexBuffers)
+				a3dmesh = createMesh(Config,obj,exportindex,linkedimg,linkeddata,linkedmesh,decals,meshes,objects,mesh_objects,boxes,indexBuffers,images,maps,materials,vertexBuffers)
 			elif obj["a3dtype"] == 'A3DDecal':
 				print("decal")
-				a3ddecal = createMesh(Config,obj,linkedimgdata,linkedimg,linkeddata,linkedmesh,decals,meshes,objects,mesh_objects,boxes,indexBuffers,images,maps,materials,vertexBuffers,True)
+				a3ddecal = createMesh(Config,obj,exportindex,linkedimg,linkeddata,linkedmesh,decals,meshes,objects,mesh_objects,boxes,indexBuffers,images,maps,materials,vertexBuffers,True)
 				
 	if len(objs_lights) > 0:
 		print("Exporting lights...\n")
@@ -2313,9 +3281,6 @@ def A3DExport2(file,Config):
 		#loop over every mesh and populate data
 		print(objs_mesh)
 		for obj in objs_mesh:
-			#convert to triangles
-			ConvertQuadsToTris(obj)
-			
 			#create the mesh if parent isn't lod
 			hasparentlod = False
 			if obj.parent != None:
@@ -2325,15 +3290,24 @@ def A3DExport2(file,Config):
 						hasparentlod = True
 						
 			if hasparentlod == 0:
-			
+				if isLinkedCopy(obj,linkeddata):
+					#buffers, surfaces and images come from the first user, nothing to triangulate
+					a3dmesh = createMesh(Config,obj,exportindex,linkedimg,linkeddata,linkedmesh,decals,meshes,objects,mesh_objects,boxes,indexBuffers,images,maps,materials,vertexBuffers)
+					continue
+				#convert to triangles
+				tobj = getTriangulatedObject(obj)
+				a3dmesh = createMesh(Config,tobj,exportindex,linkedimg,linkeddata,linkedmesh,decals,meshes,objects,mesh_objects,boxes,indexBuffers,images,maps,materials,vertexBuffers)
+				
 				if Config.CopyImgs:
-					print("copy images...\n")
-					copyImages(obj,Config.filePath)
-					
-				a3dmesh = createMesh(Config,obj,linkedimgdata,linkedimg,linkeddata,linkedmesh,decals,meshes,objects,mesh_objects,boxes,indexBuffers,images,maps,materials,vertexBuffers)
+					copyImages(tobj,Config.filePath,copy_set,Config.SortSurfaces == 1)
+				freeTriangulatedObject(tobj)
 			else:
 				print("didn't write mesh as parent is lod")
 		
+		if Config.CopyImgs:
+			print("copy images...\n")
+			copyImageSet(copy_set)
+		
 	if Config.A3DVersionSystem <= 3:
 		print("Exporting layers...\n")
 			
@@ -2399,14 +3373,72 @@ def A3DExport2(file,Config):
 					cameras.append(a3dcam)
 		print("Exporting Lods...\n")
 		
+	if Config.ShareBuffers == 1:
+		shareIdenticalBuffers(indexBuffers,vertexBuffers,[meshes,decals])
+	
 	# create a3d2 object from data
 	a3d2 = A3D2(ambientLights,animationClips,animationTracks,boxes,cubeMaps,decals,directionalLights,images,indexBuffers,joints,maps,materials,meshes,objects,omniLights,spotLights,sprites,skins,vertexBuffers,layers,cameras,lods,Config)
 	
 	# save to file
 	a3d2.write(file)
+	if Config.Manifest != None:
+		Config.Manifest.save()
+	surfaceCache.clear()
 	
 	print('Export Completed...\n')
 
+class A3DExportIndex:
+	#export wide lookup so identical images, maps and materials are only written once
+	def __init__(self,Config,images,maps,materials):
+		self.Config = Config
+		self.images = images
+		self.maps = maps
+		self.materials = materials
+		self.imageKeys = {}
+		self.mapKeys = {}
+		self.materialKeys = {}
+	
+	def getImageId(self,image):
+		#relative and absolute paths to the same file give the same image
+		path = bpy.path.abspath(image.filepath) if image and image.filepath else ""
+		key = os.path.realpath(path) if path != "" else ""
+		if key not in self.imageKeys:
+			a3dstr = A3DString()
+			a3dstr.name = os.path.basename(path)
+			a3dimg = A3D2Image(self.Config)
+			a3dimg._id = len(self.images)
+			a3dimg._url = a3dstr
+			self.images.append(a3dimg)
+			self.imageKeys[key] = a3dimg._id
+		return self.imageKeys[key]
+	
+	def getMap(self,imgid,channel=0):
+		key = (imgid,channel)
+		if key not in self.mapKeys:
+			a3dmap = A3D2Map(self.Config)
+			a3dmap._channel = channel
+			a3dmap._id = len(self.maps)
+			a3dmap._imageId = imgid
+			self.maps.append(a3dmap)
+			self.mapKeys[key] = a3dmap
+		return self.mapKeys[key]
+	
+	def getMaterial(self,difmap,glossmap,lighmap,normmap,opacmap,reflmap,specmap):
+		key = (difmap,glossmap,lighmap,normmap,opacmap,reflmap,specmap)
+		if key not in self.materialKeys:
+			a3dmat = A3D2Material(self.Config)
+			a3dmat._diffuseMapId = difmap
+			a3dmat._glossinessMapId = glossmap
+			a3dmat._id = len(self.materials)
+			a3dmat._lightMapId = lighmap
+			a3dmat._normalMapId = normmap
+			a3dmat._opacityMapId = opacmap
+			a3dmat._reflectionCubeMapId = reflmap
+			a3dmat._specularMapId = specmap
+			self.materials.append(a3dmat)
+			self.materialKeys[key] = a3dmat
+		return self.materialKeys[key]
+
 def createObject(Config,obj,objects,mesh_objects):
 	a3dstr2 = A3DString()
 	a3dstr2.name = "obj_"+cleanupString(obj.data.name)
@@ -2438,7 +3470,11 @@ def createObject(Config,obj,objects,mesh_objects):
 	mesh_objects.append(a3dobj)
 	return a3dobj
 	
-def createMesh(Config,obj,linkedimgdata,linkedimg,linkeddata,linkedmesh,decals,meshes,objects,mesh_objects,boxes,indexBuffers,images,maps,materials,vertexBuffers,isdecal=False):
+def isLinkedCopy(obj,linkeddata):
+	#a later user of a mesh createMesh already exported, it only needs the object's own data
+	return (obj.data.users > 1) and (obj.data.name in linkeddata)
+
+def createMesh(Config,obj,exportindex,linkedimg,linkeddata,linkedmesh,decals,meshes,objects,mesh_objects,boxes,indexBuffers,images,maps,materials,vertexBuffers,isdecal=False):
 	mesh = obj.data
 	if mesh.users > 1:
 		print('this has is used for other objs aka linked copy')
@@ -2453,8 +3489,8 @@ def createMesh(Config,obj,linkedimgdata,linkedimg,linkeddata,linkedmesh,decals,m
 			#user doesn't exist yet
 			ibufid = len(indexBuffers)
 			vbufids = [len(vertexBuffers)]
-			#assign for other users
-			linkeddata[mesh.name] = [ibufid,vbufids]
+			#assign for other users, triangle count and surfaces are filled in below
+			linkeddata[mesh.name] = [ibufid,vbufids,0,None]
 			linkedmesh=False
 	else:
 		#print("single user mesh")
@@ -2462,13 +3498,41 @@ def createMesh(Config,obj,linkedimgdata,linkedimg,linkeddata,linkedmesh,decals,m
 		ibufid = len(indexBuffers)
 		vbufids = [len(vertexBuffers)]
 	
-	#get raw geometry data
-	if checkBMesh() == True:
-		vs,uvlayers,ins,nr,tan,bb,trns = getCommonData(Config,obj)
+	#buffers of meshes unchanged since the last incremental export come from the manifest
+	cached = None
+	manifestkey = None
+	geomkey = None
+	if (linkedmesh == False) and (Config.Manifest != None):
+		#hash the mesh once for both the manifest and geometryCache
+		geomkey = getGeometryKey(Config,mesh)
+		manifestkey = Config.Manifest.getKey(Config,mesh,geomkey)
+		cached = Config.Manifest.get(manifestkey)
+	
+	#get raw geometry data, linked copies reuse the buffers already written
+	if (linkedmesh == True) or (cached != None):
+		vs,uvlayers,ins,nr,tan = [],{},[],[],[]
+		bb = getBoundBox(obj)
+		trns = getObjTransform(obj)
 	else:
-		vs,uvlayers,ins,nr,tan,bb,trns = getCommonDataNoBmesh(Config,obj)
-	#get surface data
-	start,end,mts,mats,uvimgs = collectSurfaces(mesh)
+		vs,uvlayers,ins,nr,tan,bb,trns = getCachedCommonData(Config,obj,key=geomkey)
+	#triangles in the index buffer, linked copies take the count of the first user
+	if linkedmesh == True:
+		numtris = linkeddata[mesh.name][2]
+	elif cached != None:
+		numtris = int(cached[1]/3)
+		if mesh.name in linkeddata:
+			linkeddata[mesh.name][2] = numtris
+	else:
+		numtris = int(len(ins)/3)
+		if mesh.name in linkeddata:
+			linkeddata[mesh.name][2] = numtris
+	#get surface data, one contiguous surface per material
+	if linkedmesh == True:
+		(start,end,mts,mats,uvimgs),order = linkeddata[mesh.name][3]
+	else:
+		(start,end,mts,mats,uvimgs),order = getSurfaces(mesh,Config.SortSurfaces == 1)
+		if mesh.name in linkeddata:
+			linkeddata[mesh.name][3] = ((start,end,mts,mats,uvimgs),order)
 	
 	a3dobj = None
 	#create parent object if hierarchy and no parent
@@ -2487,14 +3551,11 @@ def createMesh(Config,obj,linkedimgdata,linkedimg,linkeddata,linkedmesh,decals,m
 		a3dbox._id = len(boxes)
 		boxes.append(a3dbox)
 	
-	#create indexbuffer
+	#create indexbuffer, filled in by buildMeshBuffers
 	if linkedmesh == False:
 		a3dibuf = A3D2IndexBuffer(Config)
-		for x in range(len(ins)):
-			a3dibuf._byteBuffer.append(ins[x])
 		#a3dibuf._id = len(indexBuffers)
 		a3dibuf._id = ibufid
-		a3dibuf._indexCount = len(a3dibuf._byteBuffer)
 		indexBuffers.append(a3dibuf)
 	
 	#notes to self -taken from obj exporter
@@ -2547,34 +3608,8 @@ def createMesh(Config,obj,linkedimgdata,linkedimg,linkeddata,linkedmesh,decals,m
 					#print(os.path.basename(bpy.path.display_name_from_filepath(tex.texture.image.filepath)))
 					#print(os.path.basename(bpy.path.abspath(tex.texture.image.filepath)))
 					
-					if tex.texture.image and tex.texture.image.filepath in linkedimgdata:
-						#user already exists, retrieve ids
-						imgid = linkedimgdata[tex.texture.image.filepath][0]
-						#set to true so we don't add buffers with data we don't need
-						linkedimg=True
-					else:
-						#user doesn't exist yet
-						imgid = len(images)
-						#assign for other users
-						linkedimgdata[tex.texture.image.filepath if tex.texture.image and tex.texture.image.filepath else ""] = [imgid]
-						linkedimg = False
-
-					#create image
-					if linkedimg == False:
-						a3dstr = A3DString()
-						#a3dstr.name = os.path.basename(tex.texture.image.filepath)
-						a3dstr.name = os.path.basename(bpy.path.abspath(tex.texture.image.filepath)) if tex.texture.image and tex.texture.image.filepath else ""
-						
-						a3dimg = A3D2Image(Config)
-						a3dimg._id = imgid
-						a3dimg._url = a3dstr
-						images.append(a3dimg)
-					
-					a3dmap = A3D2Map(Config)
-					a3dmap._channel = 0
-					a3dmap._id = len(maps)
-					a3dmap._imageId = imgid
-					maps.append(a3dmap)
+					imgid = exportindex.getImageId(tex.texture.image)
+					a3dmap = exportindex.getMap(imgid)
 					
 					if name.startswith('diffuse'):
 						difmap = a3dmap._id
@@ -2611,20 +3646,7 @@ def createMesh(Config,obj,linkedimgdata,linkedimg,linkeddata,linkedmesh,decals,m
 			#	maps.append(a3dmap)
 			
 			#create material
-			a3dmat = A3D2Material(Config)
-			#if matname is not None:
-			#	a3dmat._diffuseMapId = a3dmap._id
-			#else:
-			#	a3dmat._diffuseMapId = int("ffffffff",16)
-			a3dmat._diffuseMapId = difmap
-			a3dmat._glossinessMapId = glossmap
-			a3dmat._id = len(materials)
-			a3dmat._lightMapId = lighmap
-			a3dmat._normalMapId = normmap
-			a3dmat._opacityMapId = opacmap
-			a3dmat._reflectionCubeMapId = reflmap
-			a3dmat._specularMapId = specmap
-			materials.append(a3dmat)
+			a3dmat = exportindex.getMaterial(difmap,glossmap,lighmap,normmap,opacmap,reflmap,specmap)
 			
 			#create surface
 			a3dsurf = A3D2Surface(Config)
@@ -2646,48 +3668,12 @@ def createMesh(Config,obj,linkedimgdata,linkedimg,linkeddata,linkedmesh,decals,m
 			reflmap = int("ffffffff",16)
 			
 			if uvimgs[x] != None:
-				if uvimgs[x].filepath in linkedimgdata:
-					#user already exists, retrieve ids
-					imgid = linkedimgdata[uvimgs[x].filepath][0]
-					#set to true so we don't add buffers with data we don't need
-					linkedimg=True
-				else:
-					#user doesn't exist yet
-					imgid = len(images)
-					#assign for other users
-					linkedimgdata[uvimgs[x].filepath] = [imgid]
-					linkedimg = False
-				
-			#create image
-			if (linkedimg == False) and (uvimgs[x] != None):
-				a3dstr = A3DString()
-				a3dstr.name = os.path.basename(bpy.path.abspath(uvimgs[x].filepath))
-				
-				a3dimg = A3D2Image(Config)
-				a3dimg._id = imgid
-				a3dimg._url = a3dstr
-				images.append(a3dimg)
-			
-			if uvimgs[x] != None:
-				a3dmap = A3D2Map(Config)
-				a3dmap._channel = 0
-				a3dmap._id = len(maps)
-				a3dmap._imageId = imgid
-				maps.append(a3dmap)	
-				
+				imgid = exportindex.getImageId(uvimgs[x])
+				a3dmap = exportindex.getMap(imgid)
 				#just set to diffuse
 				difmap = a3dmap._id
 			
-			a3dmat = A3D2Material(Config)
-			a3dmat._diffuseMapId = difmap
-			a3dmat._glossinessMapId = glossmap
-			a3dmat._id = len(materials)
-			a3dmat._lightMapId = lighmap
-			a3dmat._normalMapId = normmap
-			a3dmat._opacityMapId = opacmap
-			a3dmat._reflectionCubeMapId = reflmap
-			a3dmat._specularMapId = specmap
-			materials.append(a3dmat)
+			a3dmat = exportindex.getMaterial(difmap,glossmap,lighmap,normmap,opacmap,reflmap,specmap)
 			
 			#create surface
 			a3dsurf = A3D2Surface(Config)
@@ -2702,7 +3688,7 @@ def createMesh(Config,obj,linkedimgdata,linkedimg,linkeddata,linkedmesh,decals,m
 		a3dsurf._indexBegin = 0
 		#a3dsurf._materialId = int("ffffffff",16)
 		#a3dsurf._materialId = 0
-		a3dsurf._numTriangles = int(len(ins)/3)
+		a3dsurf._numTriangles = numtris
 		mesh_surfaces.append(a3dsurf)
 	
 	#create transform/matrix
@@ -2784,15 +3770,6 @@ def createMesh(Config,obj,linkedimgdata,linkedimg,linkeddata,linkedmesh,decals,m
 			decals.append(a3ddecal)
 			mesh_objects.append(a3ddecal)
 
-	#reverse uvlayers, because a3d player loads latest uvlayer as default
-	revkeys = sorted(uvlayers.keys(), reverse=True)
-	uvlayersr = {}
-	i=0
-	for k in revkeys:
-		uvlayersr[i] = uvlayers[k]
-		i = i +1
-	uvlayers = uvlayersr
-	
 	if linkedmesh == False:
 		#create vertexbuffer
 		a3dvbuf = A3D2VertexBuffer(Config)
@@ -2805,56 +3782,152 @@ def createMesh(Config,obj,linkedimgdata,linkedimg,linkeddata,linkedmesh,decals,m
 				attar.append(4)
 		if (len(nr) > 0) and (Config.ExportNormals == 1):
 			attar.append(1)
-		if (len(tan) > 0) and (Config.ExportTangents == 1):
+		if hasTangents(Config,uvlayers,nr):
 			attar.append(2)
 		#if len(jnt) > 0:
 		#	attar.append(3)
 		
 		a3dvbuf._attributes = attar
-		j=0
-		for v in vs:
-			if 0 in attar:
-				a3dvbuf._byteBuffer.append(v[0]) #vert1
-				a3dvbuf._byteBuffer.append(v[1]) #vert2
-				a3dvbuf._byteBuffer.append(v[2]) #vert3
-			if 4 in attar and (Config.ExportUV == 1):			
-				for uvname, uvdata in uvlayers.items():
-					uvt = uvdata[0]
-					a3dvbuf._byteBuffer.append(uvt[j][0]) #uv
-					a3dvbuf._byteBuffer.append(uvt[j][1]) #uv
-			if 1 in attar and (Config.ExportNormals == 1):
-				a3dvbuf._byteBuffer.append(nr[j][0]) #normal1
-				a3dvbuf._byteBuffer.append(nr[j][1]) #normal2
-				a3dvbuf._byteBuffer.append(nr[j][2]) #normal3
-			if 2 in attar and (Config.ExportTangents == 1):
-				a3dvbuf._byteBuffer.append(tan[j][0]) #tan1
-				a3dvbuf._byteBuffer.append(tan[j][1]) #tan2
-				a3dvbuf._byteBuffer.append(tan[j][2]) #tan3
-				a3dvbuf._byteBuffer.append(-1) #tan4 - static input handedness
-			j = j +1
 		a3dvbuf._id = len(vertexBuffers)
-		#a3dvbuf._vertexCount = int(len(ins))
-		#a3dvbuf._vertexCount = int(len(vs) * 3) 
-		a3dvbuf._vertexCount = int(len(vs)) #this works for cube
-		#a3dvbuf._vertexCount = int(len(ins)) 
-		#a3dvbuf._vertexCount = 24
 		vertexBuffers.append(a3dvbuf)
-		#print("vs="+str(len(vs)))	
+		
+		if cached != None:
+			print(mesh.name+" unchanged, reusing buffers from last export")
+			a3dvbuf._attributes,a3dibuf._indexCount,a3dibuf._data,a3dvbuf._vertexCount,a3dvbuf._data = cached
+			return a3dmesh if isdecal == False else a3ddecal
+		
+		buildMeshBuffers(Config,a3dibuf,a3dvbuf,vs,uvlayers,ins,nr,start,end,order,manifestkey)
 	if isdecal == False:
 		return a3dmesh
 	else:
 		return a3ddecal
+
+def buildMeshBuffers(Config,a3dibuf,a3dvbuf,vs,uvlayers,ins,nr,start,end,order,manifestkey):
+	#fills and serialises the index and vertex buffer of createMesh
+	if Config.DedupVertices == 1:
+		#weld on position/normal/uvs, the tangents are then accumulated on the welded vertices
+		vs,uvlayers,ins,nr,tan = dedupVertices(vs,uvlayers,ins,nr,[])
+	tan = getTangents(Config,vs,uvlayers,ins,nr)
+	if order is not None:
+		ins = sortTriangles(ins,order)
+	if Config.OptimiseVertexCache == 1:
+		vs,uvlayers,ins,nr,tan = optimizeMeshCache(vs,uvlayers,ins,nr,tan,start,end)
+	
+	for x in range(len(ins)):
+		a3dibuf._byteBuffer.append(ins[x])
+	a3dibuf._indexCount = len(a3dibuf._byteBuffer)
 	
+	#reverse uvlayers, because a3d player loads latest uvlayer as default
+	revkeys = sorted(uvlayers.keys(), reverse=True)
+	uvlayersr = {}
+	i=0
+	for k in revkeys:
+		uvlayersr[i] = uvlayers[k]
+		i = i +1
+	uvlayers = uvlayersr
+	
+	attar = a3dvbuf._attributes
+	j=0
+	for v in vs:
+		if 0 in attar:
+			a3dvbuf._byteBuffer.append(v[0]) #vert1
+			a3dvbuf._byteBuffer.append(v[1]) #vert2
+			a3dvbuf._byteBuffer.append(v[2]) #vert3
+		if 4 in attar and (Config.ExportUV == 1):			
+			for uvname, uvdata in uvlayers.items():
+				uvt = uvdata[0]
+				a3dvbuf._byteBuffer.append(uvt[j][0]) #uv
+				a3dvbuf._byteBuffer.append(uvt[j][1]) #uv
+		if 1 in attar and (Config.ExportNormals == 1):
+			a3dvbuf._byteBuffer.append(nr[j][0]) #normal1
+			a3dvbuf._byteBuffer.append(nr[j][1]) #normal2
+			a3dvbuf._byteBuffer.append(nr[j][2]) #normal3
+		if 2 in attar and (Config.ExportTangents == 1):
+			a3dvbuf._byteBuffer.append(tan[j][0]) #tan1
+			a3dvbuf._byteBuffer.append(tan[j][1]) #tan2
+			a3dvbuf._byteBuffer.append(tan[j][2]) #tan3
+			a3dvbuf._byteBuffer.append(tan[j][3]) #tan4 - handedness
+		j = j +1
+	#a3dvbuf._vertexCount = int(len(ins))
+	#a3dvbuf._vertexCount = int(len(vs) * 3) 
+	a3dvbuf._vertexCount = int(len(vs)) #this works for cube
+	#a3dvbuf._vertexCount = int(len(ins)) 
+	#a3dvbuf._vertexCount = 24
+	#print("vs="+str(len(vs)))
+	
+	#serialise here so shareIdenticalBuffers can compare bytes, A3D2.write just copies them
+	a3dibuf._data = a3dibuf.packBuffer()
+	a3dvbuf._data = a3dvbuf.packBuffer()
+	if manifestkey != None:
+		Config.Manifest.put(manifestkey,(a3dvbuf._attributes,a3dibuf._indexCount,a3dibuf._data,a3dvbuf._vertexCount,a3dvbuf._data))
+
+def shareBuffers(buffers,getkey):
+	#keep the first buffer of each content, returns old id -> new id with ids renumbered in order
+	first = {}
+	remap = {}
+	kept = []
+	for buf in buffers:
+		key = getkey(buf)
+		if key not in first:
+			first[key] = len(kept)
+			kept.append(buf)
+		remap[buf._id] = first[key]
+	for x in range(len(kept)):
+		kept[x]._id = x
+	buffers[:] = kept
+	return remap
+
+def shareIdenticalBuffers(indexBuffers,vertexBuffers,mesh_lists):
+	#separate meshes with identical geometry (shift-d copies, imported props) point at one set of buffers
+	numibufs = len(indexBuffers)
+	numvbufs = len(vertexBuffers)
+	iremap = shareBuffers(indexBuffers,lambda buf: (buf._indexCount,buf._data))
+	vremap = shareBuffers(vertexBuffers,lambda buf: (tuple(buf._attributes),buf._vertexCount,buf._data))
+	for meshlist in mesh_lists:
+		for m in meshlist:
+			m._indexBufferId = iremap[m._indexBufferId]
+			m._vertexBuffers = [vremap[v] for v in m._vertexBuffers]
+	print("shared buffers: %i -> %i index, %i -> %i vertex\n" % (numibufs,len(indexBuffers),numvbufs,len(vertexBuffers)))
+
 #==================================
 # A3D IMPORTER
 #==================================
 
 class A3DImporterSettings:
-	def __init__(self,FilePath="",ApplyTransforms=1,ImportLighting=1,ImportCameras=1):
+	def __init__(self,FilePath="",ApplyTransforms=1,ImportLighting=1,ImportCameras=1,WeldVertices=0):
 		self.FilePath = str(FilePath)
 		self.ApplyTransforms = int(ApplyTransforms)
 		self.ImportLighting = int(ImportLighting)
 		self.ImportCameras = int(ImportCameras)
+		self.WeldVertices = int(WeldVertices)
+		self.ImportBatch = None
+
+class A3DImportBatch:
+	def __init__(self):
+		self.objects = []
+
+	def reset(self):
+		self.objects = []
+
+	def link(self,ob):
+		#defer scene linking so N imported objects don't cost N scene/depsgraph updates
+		self.objects.append(ob)
+
+	def commit(self):
+		if len(self.objects) == 0:
+			return
+		scene = bpy.context.scene
+		for ob in self.objects:
+			scene.objects.link(ob)
+
+		#select imported objects once, last one created is active as before
+		for object in scene.objects:
+			object.select = False
+		for ob in self.objects:
+			ob.select = True
+		scene.objects.active = self.objects[-1]
+		scene.update()
+		self.reset()
 
 class A3DImporter(bpy.types.Operator):
 	bl_idname = "ops.a3dimporter"
@@ -2864,6 +3937,7 @@ class A3DImporter(bpy.types.Operator):
 	ApplyTransforms = BoolProperty(name="Apply Transforms", description="Apply transforms to objects", default=True)
 	ImportLighting = BoolProperty(name="Import Lighting", description="Import the lighting setup", default=True)
 	ImportCameras = BoolProperty(name="Import Cameras", description="Import any scene cameras", default=True)
+	WeldVertices = BoolProperty(name="Weld Vertices", description="Merge vertices with identical position, normal and uvs into shared vertices", default=False)
 	filepath= StringProperty(name="File Path", description="Filepath used for importing the A3D file", maxlen=1024, default="")
 
 	def execute(self, context):
@@ -2871,7 +3945,7 @@ class A3DImporter(bpy.types.Operator):
 		file = open(self.filepath,'rb')
 		file.seek(0)
 		version = ord(file.read(1))
-		Config = A3DImporterSettings(FilePath=self.filepath,ApplyTransforms=self.ApplyTransforms,ImportLighting=self.ImportLighting,ImportCameras=self.ImportCameras)
+		Config = A3DImporterSettings(FilePath=self.filepath,ApplyTransforms=self.ApplyTransforms,ImportLighting=self.ImportLighting,ImportCameras=self.ImportCameras,WeldVertices=self.WeldVertices)
 		if version == 0:
 			A3DImport1(file,Config)
 		else:
@@ -4618,7 +5692,10 @@ class A3D2:
 		objects = {}
 		for obje in self.objects:
 			objects[obje._id] = obje
-		
+
+		#objects are created first and linked to the scene together at the end
+		self.Config.ImportBatch = A3DImportBatch()
+
 		if self.Config.ImportLighting == 1:
 			for light in self.ambientLights:
 				light.render(objects)
@@ -4650,7 +5727,9 @@ class A3D2:
 			
 		for lod in self.lods:
 			lod.render(meshes)
-		
+
+		self.Config.ImportBatch.commit()
+	
 	def read(self,file,mask,ver):
 		print("reada3d2")
 		
@@ -4748,9 +5827,11 @@ class A3D2:
 			self.nullmask = self.nullmask + str(1)
 					
 	def write(self,file):
+		#the package is built in memory so its length is known before anything is written,
+		#file only needs write() and can be a pipe or socket
 		print("write a3d2\n")
 		
-		tfile = tempfile.TemporaryFile(mode ='w+b')
+		tfile = BytesIO()
 		
 		self.writeClass(tfile,self.ambientLights)	
 		self.writeClass(tfile,self.animationClips)	
@@ -4777,7 +5858,7 @@ class A3D2:
 			self.writeClass(tfile,self.cameras)
 			self.writeClass(tfile,self.lods)
 		
-		tfile2 = tempfile.TemporaryFile(mode ='w+b')
+		tfile2 = BytesIO()
 		
 		#nullmask
 		null = A3D2Null(self.Config)
@@ -4808,37 +5889,23 @@ class A3D2:
 		ver.write(tfile2)
 		
 		#a3d2
-		tfile.seek(0)
-		data = tfile.read()
-		tfile2.write(data)
+		tfile2.write(tfile.getvalue())
 		tfile.close()
+		data = tfile2.getvalue()
+		tfile2.close()
 		
 		#write package length
 		a3dpack = A3D2Package(self.Config)
 		if self.Config.CompressData == 1:
+			# compressed
+			data = zlib.compress(data)
 			a3dpack._packed = 1
-			tfile2.seek(0)
-			indata = tfile2.read()
-			outdata = zlib.compress(indata)
-			a3dpack._length = len(outdata)
 		else:
-			a3dpack._length = tfile2.tell()
+			# uncompressed
 			a3dpack._packed = 0
+		a3dpack._length = len(data)
 		a3dpack.write(file)
-		
-		#compress and write data
-		if self.Config.CompressData == 1:
-			# compressed
-			tfile2.seek(0)
-			indata = tfile2.read()
-			outdata = zlib.compress(indata)
-			file.write(outdata)
-		else:
-			# uncompressed
-			tfile2.seek(0)
-			data = tfile2.read()
-			file.write(data)
-		tfile2.close()
+		file.write(data)
 
 # lighting	
 	
@@ -4946,7 +6013,7 @@ class A3D2AmbientLight:
 			ob.matrix_local = self._transform.getMatrix()
 		else:
 			ob.location = bpy.context.scene.cursor_location
-		bpy.context.scene.objects.link(ob)
+		self.Config.ImportBatch.link(ob)
 		
 		if self._visible == False:
 			ob.hide = False
@@ -5054,7 +6121,7 @@ class A3D2DirectionalLight:
 			ob.matrix_local = self._transform.getMatrix()
 		else:
 			ob.location = bpy.context.scene.cursor_location
-		bpy.context.scene.objects.link(ob)
+		self.Config.ImportBatch.link(ob)
 		
 		if self._visible == False:
 			ob.hide = False
@@ -5173,7 +6240,7 @@ class A3D2OmniLight:
 			ob.matrix_local = self._transform.getMatrix()
 		else:
 			ob.location = bpy.context.scene.cursor_location
-		bpy.context.scene.objects.link(ob)
+		self.Config.ImportBatch.link(ob)
 		
 		if self._visible == False:
 			ob.hide = False
@@ -5326,7 +6393,7 @@ class A3D2SpotLight:
 			ob.matrix_local = self._transform.getMatrix()
 		else:
 			ob.location = bpy.context.scene.cursor_location
-		bpy.context.scene.objects.link(ob)
+		self.Config.ImportBatch.link(ob)
 		
 		if self._visible == False:
 			ob.hide = False
@@ -5554,6 +6621,9 @@ class A3D2Mesh:
 		#print(self._name)
 		#print(uvlayers)
 		
+		if self.Config.WeldVertices == 1:
+			verts,faces,norms,uvlayers = weldVertices(verts,faces,norms,uvlayers)
+		
 		if self._name is not None:
 			nme = self._name
 		else:
@@ -5571,8 +6641,8 @@ class A3D2Mesh:
 			# position object at 3d-cursor
 			ob.location = bpy.context.scene.cursor_location
 		
-		# Link object to scene
-		bpy.context.scene.objects.link(ob)  
+		# Queue object, linked to the scene with the rest of the import
+		self.Config.ImportBatch.link(ob)
 		
 		# Fill the mesh with verts, edges, faces 
 		# from_pydata doesn't work correctly, it swaps vertices in some triangles 
@@ -5587,12 +6657,6 @@ class A3D2Mesh:
 		#for i in range(len(faces)):
 		#	me.faces[i].vertices=faces[i]
 		
-		#select object
-		for object in bpy.data.objects:
-			object.select = False
-		ob.select = True
-		bpy.context.scene.objects.active = ob
-		
 		#me.update(calc_edges=True)    # Update mesh with new data
 		
 		diffuseimg = None
@@ -7085,6 +8149,7 @@ class A3D2IndexBuffer:
 		self._byteBuffer = []
 		self._id = 0
 		self._indexCount = 0
+		self._data = None
 		
 		self._optionals = []
 		self._optmask = ""
@@ -7095,6 +8160,7 @@ class A3D2IndexBuffer:
 		self._byteBuffer = []
 		self._id = 0
 		self._indexCount = 0
+		self._data = None
 		self._mskindex = 0
 				
 	def read(self,file,mask,mskindex):
@@ -7108,20 +8174,24 @@ class A3D2IndexBuffer:
 		
 	def write(self,file):
 		arr = A3DArray()
-		# multiply by 2 because its length of bytes and we are using 2 bytes
-		vbuflen = int(len(self._byteBuffer) * 2)
+		if self._data is None:
+			self._data = self.packBuffer()
+		# length of bytes, each index uses 2 bytes
+		vbuflen = len(self._data)
 		#vbuflen = len(self._byteBuffer) 
 		#vbuflen = int((len(self._byteBuffer) * 3) * 2)
 		arr.write(file,vbuflen) 
-		for x in range(len(self._byteBuffer)):
-			#each index uses 2 bytes (little-endian)
-			file.write(pack('<H',self._byteBuffer[x]))
+		file.write(self._data)
 		#write id
 		file.write(pack('>L',self._id))
 		#write indexcount
 		file.write(pack('>L',self._indexCount))
 		#print("ibuf_indexCount="+str(self._indexCount))
 		#print("ibuf_byteBufferlength="+str(vbuflen))
+	
+	def packBuffer(self):
+		#each index uses 2 bytes (little-endian)
+		return pack('<%iH' % len(self._byteBuffer),*self._byteBuffer)
 
 class A3D2VertexBuffer:
 	def __init__(self,Config):
@@ -7129,6 +8199,7 @@ class A3D2VertexBuffer:
 		self._byteBuffer = []
 		self._id = 0
 		self._vertexCount = 0
+		self._data = None
 		
 		self._optionals = []
 		self._optmask = ""
@@ -7140,6 +8211,7 @@ class A3D2VertexBuffer:
 		self._byteBuffer = []
 		self._id = 0
 		self._vertexCount = 0
+		self._data = None
 		self._mskindex = 0
 				
 	def read(self,file,mask,mskindex):
@@ -7174,22 +8246,20 @@ class A3D2VertexBuffer:
 		for x in range(len(self._attributes)):
 			file.write(pack(">L",self._attributes[x]))
 		arr = A3DArray()
-		bybufsize = int(len(self._byteBuffer)*4)
-
-		#if version 2.6 then compressed vertex buffer
-		if self.Config.A3DVersionSystem == 1:
-			#2.6
-			arr.write(file,int(bybufsize/2)) #half it because we storing shorts now
-			for float32 in self._byteBuffer:
-				fcomp = Float16Compressor()
-				f16 = fcomp.compress(float32)
-				file.write(pack(">H",f16))
-		else:
-			arr.write(file,bybufsize) 
-			for byte in self._byteBuffer:
-				file.write(pack("<f",byte))
+		#if version 2.6 then compressed vertex buffer, packBuffer stores shorts instead of floats
+		if self._data is None:
+			self._data = self.packBuffer()
+		arr.write(file,len(self._data)) 
+		file.write(self._data)
 		file.write(pack(">L",self._id))
 		file.write(pack(">H",self._vertexCount))
+	
+	def packBuffer(self):
+		if self.Config.A3DVersionSystem == 1:
+			#2.6
+			fcomp = Float16Compressor()
+			return pack(">%iH" % len(self._byteBuffer),*[fcomp.compress(float32) for float32 in self._byteBuffer])
+		return pack("<%if" % len(self._byteBuffer),*self._byteBuffer)
 
 # Other
 	
@@ -7506,6 +8576,9 @@ class A3D2Decal:
 		#print(self._name)
 		#print(uvlayers)
 		
+		if self.Config.WeldVertices == 1:
+			verts,faces,norms,uvlayers = weldVertices(verts,faces,norms,uvlayers)
+		
 		if self._name is not None:
 			nme = self._name
 		else:
@@ -7523,8 +8596,8 @@ class A3D2Decal:
 			# position object at 3d-cursor
 			ob.location = bpy.context.scene.cursor_location
 		
-		# Link object to scene
-		bpy.context.scene.objects.link(ob)  
+		# Queue object, linked to the scene with the rest of the import
+		self.Config.ImportBatch.link(ob)
 		
 		# Fill the mesh with verts, edges, faces 
 		# from_pydata doesn't work correctly, it swaps vertices in some triangles 
@@ -7539,12 +8612,6 @@ class A3D2Decal:
 		#for i in range(len(faces)):
 		#	me.faces[i].vertices=faces[i]
 		
-		#select object
-		for object in bpy.data.objects:
-			object.select = False
-		ob.select = True
-		bpy.context.scene.objects.active = ob
-		
 		#me.update(calc_edges=True)    # Update mesh with new data
 		
 		ob["a3dtype"] = "A3DDecal"
@@ -8048,7 +9115,7 @@ class A3D2Sprite:
 			ob.location = bpy.context.scene.cursor_location
 			
 		ob.rotation_euler = (1.57079633,0,1) 
-		bpy.context.scene.objects.link(ob)  
+		self.Config.ImportBatch.link(ob)
 		
 		ob["a3dtype"] = "A3DSprite3D"
 		ob["a3dalwaysOnTop"] = self._alwaysOnTop
@@ -8347,7 +9414,7 @@ class A3D2Camera:
 			data.type = 'ORTHO'
 		else:
 			data.type = 'PERSP'
-		bpy.context.scene.objects.link(cam)
+		self.Config.ImportBatch.link(cam)
 		
 class A3D2LOD:
 	def __init__(self,Config):
@@ -9115,6 +10182,7 @@ def menu_func_export(self, context):
 	a3d_path = bpy.data.filepath.replace('.blend', '.a3d')
 	self.layout.operator(ASExporter.bl_idname, text='Alternativa3D Class (.as)').filepath = as_path
 	self.layout.operator(A3DExporter.bl_idname, text='Alternativa3D Binary (.a3d)').filepath = a3d_path
+	self.layout.operator(A3DPreviewExporter.bl_idname, text='Alternativa3D Live Preview')
 	
 def register():
 	bpy.utils.register_module(__name__)
@@ -0,0 +1,52 @@
+#the add-on imports bpy at the top, the plain python helpers are loaded from its source instead
+import ast, os
+import pytest
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "io_alternativa3d_tools.py")
+BLENDER = ("bpy", "bmesh", "mathutils", "bpy_extras")
+
+def isBlenderImport(node):
+	if isinstance(node, ast.ImportFrom):
+		names = [node.module]
+	else:
+		names = [alias.name for alias in node.names]
+	return any(name.split(".")[0] in BLENDER for name in names)
+
+def isBlenderClass(node):
+	#operators, menus and panels subclass bpy.types
+	return any(ast.unparse(base).split(".")[0] in BLENDER for base in node.bases)
+
+class Functions:
+	#top level functions and classes of the add-on, run with its non blender imports
+	def __init__(self, path):
+		tree = ast.parse(open(path).read())
+		self.ns = {}
+		for node in tree.body:
+			if isinstance(node, ast.Import) and any(alias.name in BLENDER for alias in node.names):
+				#"import bpy, bmesh, os, ..." keeps the standard modules
+				node = ast.Import(names=[alias for alias in node.names if alias.name not in BLENDER])
+			elif isinstance(node, (ast.Import, ast.ImportFrom)) and isBlenderImport(node):
+				continue
+			elif isinstance(node, ast.ClassDef) and isBlenderClass(node):
+				continue
+			elif not isinstance(node, (ast.Import, ast.ImportFrom, ast.Try, ast.FunctionDef, ast.ClassDef)):
+				continue
+			exec(compile(ast.fix_missing_locations(ast.Module([node], [])), path, "exec"), self.ns)
+
+	def __getattr__(self, name):
+		try:
+			return self.ns[name]
+		except KeyError:
+			raise AttributeError(name)
+
+@pytest.fixture(scope="session")
+def a3d():
+	return Functions(SOURCE)
+
+@pytest.fixture
+def plain(a3d):
+	#the pure python paths, with numpy hidden from the add-on
+	numpy = a3d.ns["numpy"]
+	a3d.ns["numpy"] = None
+	yield a3d
+	a3d.ns["numpy"] = numpy
@@ -0,0 +1,113 @@
+#incremental export manifest and shared A3D2 buffers, no blender data involved
+import json, os
+
+class Settings:
+	A3DVersionSystem = 2
+
+def makeBuffers(a3d,indices,vertices,attributes=(0,)):
+	ibuf = a3d.A3D2IndexBuffer(Settings)
+	ibuf._byteBuffer = list(indices)
+	ibuf._indexCount = len(indices)
+	ibuf._data = ibuf.packBuffer()
+	vbuf = a3d.A3D2VertexBuffer(Settings)
+	vbuf._attributes = list(attributes)
+	vbuf._byteBuffer = list(vertices)
+	vbuf._vertexCount = int(len(vertices)/3)
+	vbuf._data = vbuf.packBuffer()
+	return ibuf,vbuf
+
+def entry(a3d,indices,vertices):
+	ibuf,vbuf = makeBuffers(a3d,indices,vertices)
+	return (vbuf._attributes,ibuf._indexCount,ibuf._data,vbuf._vertexCount,vbuf._data)
+
+def test_manifest_round_trip(a3d, tmp_path):
+	path = str(tmp_path / "scene.a3d")
+	cube = entry(a3d,[0,1,2],[0.0,0.0,0.0,1.0,0.0,0.0,0.0,1.0,0.0])
+	plane = entry(a3d,[0,2,1,2,3,1],[float(v) for v in range(12)])
+	manifest = a3d.A3DExportManifest(path)
+	manifest.load()
+	assert manifest.get("cube") is None
+	manifest.put("cube",cube)
+	manifest.put("plane",plane)
+	manifest.save()
+
+	with open(path + ".manifest") as f:
+		assert sorted(json.load(f)["entries"]) == ["cube","plane"]
+	manifest = a3d.A3DExportManifest(path)
+	manifest.load()
+	assert manifest.get("cube") == cube
+	assert manifest.get("plane") == plane
+	assert manifest.get(None) is None
+
+def test_manifest_appends_and_compacts(a3d, tmp_path):
+	path = str(tmp_path / "scene.a3d")
+	manifest = a3d.A3DExportManifest(path)
+	for x in range(4):
+		manifest.put("mesh%i" % x,entry(a3d,[0,1,2],[float(x)] * 9))
+	manifest.save()
+	size = os.path.getsize(path + ".manifest.bin")
+
+	#one mesh changed, only its buffers are appended
+	manifest = a3d.A3DExportManifest(path)
+	manifest.load()
+	for x in range(3):
+		assert manifest.get("mesh%i" % x) is not None
+	manifest.put("mesh3b",entry(a3d,[0,1,2],[9.0] * 9))
+	manifest.save()
+	grown = os.path.getsize(path + ".manifest.bin")
+	assert grown == size + size // 4
+
+	#most of the file is now dead, the next save rewrites it with the used buffers only
+	manifest = a3d.A3DExportManifest(path)
+	manifest.load()
+	kept = manifest.get("mesh3b")
+	manifest.save()
+	assert os.path.getsize(path + ".manifest.bin") == size // 4
+	manifest = a3d.A3DExportManifest(path)
+	manifest.load()
+	assert manifest.get("mesh3b") == kept
+	assert manifest.get("mesh0") is None
+
+def test_broken_manifest_starts_over(a3d, tmp_path):
+	path = str(tmp_path / "scene.a3d")
+	with open(path + ".manifest","w") as f:
+		f.write("not json")
+	manifest = a3d.A3DExportManifest(path)
+	manifest.load()
+	assert manifest.entries == {}
+
+def test_identical_buffers_are_shared(a3d):
+	indexBuffers, vertexBuffers, meshes = [], [], []
+	geometry = [
+		([0,1,2],[0.0,0.0,0.0,1.0,0.0,0.0,0.0,1.0,0.0]),
+		([0,1,2],[0.0,0.0,0.0,2.0,0.0,0.0,0.0,2.0,0.0]),
+		([0,1,2],[0.0,0.0,0.0,1.0,0.0,0.0,0.0,1.0,0.0]),
+	]
+	for indices, vertices in geometry:
+		ibuf,vbuf = makeBuffers(a3d,indices,vertices)
+		ibuf._id = len(indexBuffers)
+		indexBuffers.append(ibuf)
+		vbuf._id = len(vertexBuffers)
+		vertexBuffers.append(vbuf)
+		mesh = a3d.A3D2Mesh(Settings)
+		mesh._indexBufferId = ibuf._id
+		mesh._vertexBuffers = [vbuf._id]
+		meshes.append(mesh)
+	a3d.shareIdenticalBuffers(indexBuffers,vertexBuffers,[meshes,[]])
+	assert len(indexBuffers) == 1
+	assert len(vertexBuffers) == 2
+	assert [v._id for v in vertexBuffers] == [0,1]
+	assert [m._indexBufferId for m in meshes] == [0,0,0]
+	assert [m._vertexBuffers for m in meshes] == [[0],[1],[0]]
+
+def test_attributes_keep_buffers_apart(a3d):
+	#same bytes but a different layout is a different vertex buffer
+	ibuf,first = makeBuffers(a3d,[0,1,2],[0.0] * 9,(0,))
+	ibuf,second = makeBuffers(a3d,[0,1,2],[0.0] * 9,(1,))
+	second._id = 1
+	vertexBuffers = [first,second]
+	mesh = a3d.A3D2Mesh(Settings)
+	mesh._vertexBuffers = [1]
+	a3d.shareIdenticalBuffers([ibuf],vertexBuffers,[[mesh]])
+	assert len(vertexBuffers) == 2
+	assert mesh._vertexBuffers == [1]
@@ -0,0 +1,93 @@
+#vertex dedup, vertex cache order and quantised class geometry on plain lists
+import random
+from struct import unpack, calcsize
+import pytest
+
+def makeGrid(size=12):
+	#size x size quads of two triangles over shared vertices, rows in scan order
+	ins = []
+	for y in range(size):
+		for x in range(size):
+			a = y*(size+1) + x
+			b = a + 1
+			c = a + size + 1
+			d = c + 1
+			ins.extend((a,b,d,a,d,c))
+	return ins, (size+1)*(size+1)
+
+def triangles(ins):
+	#each triangle with its corners rotated to start at the lowest index, winding kept
+	tris = []
+	for i in range(0,len(ins),3):
+		t = ins[i:i+3]
+		k = t.index(min(t))
+		tris.append(tuple(t[k:] + t[:k]))
+	return sorted(tris)
+
+def test_dedup_welds_shared_corners(a3d):
+	#a quad written as two triangles of corners, the diagonal corners are shared
+	vs = [[0,0,0],[1,0,0],[1,1,0],[0,0,0],[1,1,0],[0,1,0]]
+	nr = [[0,0,1]] * 6
+	uvt = [[v[0],v[1]] for v in vs]
+	dvs,duvlayers,dins,dnr,dtan = a3d.dedupVertices(vs,{"UVMap":[uvt]},list(range(6)),nr,[])
+	assert len(dvs) == 4
+	assert len(duvlayers["UVMap"][0]) == 4
+	assert len(dnr) == 4
+	assert dtan == []
+	assert [dvs[i] for i in dins] == vs
+	assert [duvlayers["UVMap"][0][i] for i in dins] == uvt
+
+def test_dedup_keeps_uv_seams(a3d):
+	#same position and normal but different uvs stay two vertices
+	vs = [[0,0,0],[1,0,0],[0,1,0],[0,0,0],[0,1,0],[-1,0,0]]
+	nr = [[0,0,1]] * 6
+	uvt = [[0,0],[1,0],[0,1],[1,1],[0,1],[1,0]]
+	dvs,duvlayers,dins,dnr,dtan = a3d.dedupVertices(vs,{"UVMap":[uvt]},list(range(6)),nr,[])
+	assert len(dvs) == 5
+	assert [duvlayers["UVMap"][0][i] for i in dins] == uvt
+
+def test_dedup_leaves_mismatched_streams(a3d):
+	#per vertex normals with per corner uvs can't be keyed, everything is returned as is
+	vs = [[0,0,0],[1,0,0],[0,1,0]]
+	uvlayers = {"UVMap":[[[0,0],[1,0]]]}
+	result = a3d.dedupVertices(vs,uvlayers,[0,1,2],[[0,0,1]] * 3,[])
+	assert result[0] is vs
+	assert result[1] is uvlayers
+
+def test_acmr_of_a_single_strip(a3d):
+	#every vertex misses once, two triangles over four vertices
+	assert a3d.calculateACMR([0,1,2,2,1,3]) == 2.0
+	assert a3d.calculateACMR([]) == 0.0
+
+def test_vertex_cache_order_keeps_triangles(a3d):
+	ins, numverts = makeGrid()
+	rnd = random.Random(3)
+	tris = [ins[i:i+3] for i in range(0,len(ins),3)]
+	rnd.shuffle(tris)
+	shuffled = [i for t in tris for i in t]
+	out = a3d.optimizeVertexCache(shuffled,numverts,cachesize=16)
+	assert triangles(out) == triangles(shuffled)
+	assert a3d.calculateACMR(out,16) < a3d.calculateACMR(shuffled,16)
+	assert a3d.calculateACMR(out,16) < 1.0
+
+def test_quantised_values_round_trip(a3d):
+	rnd = random.Random(5)
+	rows = [[rnd.uniform(-50,50),rnd.uniform(0,1),rnd.uniform(-1e-3,1e-3)] for r in range(200)]
+	rows.append([3.0,0.5,0.0])
+	data = a3d.quantiseValues(rows,3)
+	head = calcsize("<6f")
+	mins = unpack("<3f",data[:calcsize("<3f")])
+	scales = unpack("<3f",data[calcsize("<3f"):head])
+	values = unpack("<%iH" % (len(rows)*3),data[head:])
+	assert len(data) == head + len(rows)*3*2
+	for r in range(len(rows)):
+		for c in range(3):
+			back = mins[c] + values[r*3+c]*scales[c]
+			span = max(row[c] for row in rows) - min(row[c] for row in rows)
+			assert back == pytest.approx(rows[r][c], abs=span/65535.0 + 1e-6)
+
+def test_quantised_constant_column(a3d):
+	#a flat column has no range, every value is written as 0 from the minimum
+	data = a3d.quantiseValues([[2.0,1.0],[2.0,3.0]],2)
+	assert unpack("<4f",data[:16]) == (2.0,1.0,0.0,pytest.approx(2.0/65535.0))
+	assert unpack("<4H",data[16:]) == (0,0,0,65535)
@@ -0,0 +1,102 @@
+#tangents of exported meshes, calculateTangents and calculateTangentsNumpy on plain lists
+import math, os, random, sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+#an xy quad facing +z, corners in the order getCommonData writes them
+QUAD = [[0.0,0.0,0.0],[1.0,0.0,0.0],[1.0,1.0,0.0],[0.0,1.0,0.0]]
+INS = [0,1,2,0,2,3]
+NRMS = [[0.0,0.0,1.0]] * 4
+
+class Settings:
+	ExportTangents = 1
+
+def makeSphere(rings=16,segments=32):
+	#uv sphere as one vertex per triangle corner, like getCommonData with face uvs
+	def point(r,s):
+		th = math.pi*r/rings
+		ph = 2*math.pi*(s % segments)/segments
+		return [round(math.sin(th)*math.cos(ph),6),round(math.sin(th)*math.sin(ph),6),round(math.cos(th),6)]
+	vs,uvt,nr,ins = [],[],[],[]
+	for r in range(rings):
+		for s in range(segments):
+			quad = [(r,s),(r+1,s),(r+1,s+1),(r,s+1)]
+			for tri in ((0,1,2),(0,2,3)):
+				for k in tri:
+					p = point(*quad[k])
+					vs.append(p)
+					nr.append(list(p))
+					uvt.append([quad[k][1]/segments,1.0 - quad[k][0]/rings])
+					ins.append(len(ins))
+	return vs,{"UVMap":[uvt]},ins,nr
+
+def test_flipped_uvs_are_left_handed(plain):
+	#uvs are written with v flipped, so v runs along -y and the runtime gives w = -1
+	uvs = [[co[0],1.0 - co[1]] for co in QUAD]
+	tan = plain.calculateTangents(INS,QUAD,uvs,NRMS)
+	for t in tan:
+		assert t[:3] == pytest.approx((1.0,0.0,0.0))
+		assert t[3] == -1.0
+
+def test_unflipped_uvs_are_right_handed(plain):
+	uvs = [[co[0],co[1]] for co in QUAD]
+	assert [t[3] for t in plain.calculateTangents(INS,QUAD,uvs,NRMS)] == [1.0] * 4
+
+def test_numpy_matches_python(plain, a3d):
+	numpy = pytest.importorskip("numpy")
+	rnd = random.Random(7)
+	verts = [[rnd.uniform(-1,1) for c in range(3)] for v in range(60)]
+	uvs = [[rnd.random(),rnd.random()] for v in range(60)]
+	nrms = []
+	for v in verts:
+		l = math.sqrt(sum(c*c for c in v)) or 1.0
+		nrms.append([c/l for c in v])
+	ins = [rnd.randrange(60) for i in range(150)]
+	a3d.ns["numpy"] = numpy
+	fast = a3d.calculateTangentsNumpy(ins,verts,uvs,nrms)
+	a3d.ns["numpy"] = None
+	slow = a3d.calculateTangents(ins,verts,uvs,nrms)
+	assert len(fast) == len(slow)
+	for f, s in zip(fast,slow):
+		assert f[:3] == pytest.approx(s[:3], abs=1e-6)
+		assert f[3] == s[3]
+
+def test_tangents_follow_the_welded_vertices(a3d):
+	vs,uvlayers,ins,nr = makeSphere()
+	assert len(vs) == 3072
+	vs,uvlayers,ins,nr,tan = a3d.dedupVertices(vs,uvlayers,ins,nr,[])
+	tan = a3d.getTangents(Settings,vs,uvlayers,ins,nr)
+	assert len(vs) == 561
+	assert len(tan) == len(vs)
+	#corners of one welded vertex share a single accumulated tangent
+	for t, n in zip(tan,nr):
+		assert abs(t[0]*n[0] + t[1]*n[1] + t[2]*n[2]) < 1e-6
+
+def test_no_tangents_without_uvs_or_setting(a3d):
+	vs,uvlayers,ins,nr = makeSphere(4,8)
+	assert a3d.getTangents(Settings,vs,{},ins,nr) == []
+	class Off:
+		ExportTangents = 0
+	assert a3d.getTangents(Off,vs,uvlayers,ins,nr) == []
+
+def test_export_handedness_in_blender():
+	#same quad through the real mesh extraction, needs blender's python
+	bpy = pytest.importorskip("bpy")
+	import io_alternativa3d_tools as addon
+	me = bpy.data.meshes.new("TangentQuad")
+	me.from_pydata([tuple(co) for co in QUAD],[],[(0,1,2),(0,2,3)])
+	me.uv_textures.new()
+	me.update()
+	for loop in me.loops:
+		co = QUAD[loop.vertex_index]
+		me.uv_layers[0].data[loop.index].uv = (co[0],co[1])
+	ob = bpy.data.objects.new("TangentQuad",me)
+	bpy.context.scene.objects.link(ob)
+	Config = addon.A3DExporterSettings()
+	vs,uvlayers,ins,nr,tan,bb,trns = addon.getCommonData(Config,ob)
+	tan = addon.getTangents(Config,vs,uvlayers,ins,nr)
+	assert len(tan) == len(vs)
+	for t in tan:
+		assert abs(t[0] - 1.0) < 1e-5
+		assert t[3] == -1.0